@@ -0,0 +1,24 @@
+# restarts postgres in place on what is left in /tmp/lazyfs.root, in two halves
+# stop:     stops postgres and unmounts lazyfs, after which the persisted data doesn't change anymore
+# start:    mounts a fresh lazyfs without injected faults and starts postgres
+
+if [ "$1" = "stop" ]; then
+    /stop-postgres.sh
+    for i in $(seq 50); do
+        pgrep -x postgres > /dev/null || break
+        sleep 0.1
+    done
+    pkill -9 postgres
+    /lazyfs/lazyfs/scripts/umount-lazyfs.sh -m /var/lib/postgresql/data
+    exit 0
+fi
+
+sed '/#begin custom cmd/,/#end custom cmd/d' /lazyfs/lazyfs/config/config.toml > /tmp/restart.toml && \
+cd /lazyfs/lazyfs && ./scripts/mount-lazyfs.sh -c /tmp/restart.toml -m /var/lib/postgresql/data -r /tmp/lazyfs.root
+# lazyfs mounts in the background, readiness of postgres itself is left to waitUntilAvailable
+for i in $(seq 100); do
+    mountpoint -q /var/lib/postgresql/data && break
+    sleep 0.05
+done
+# detached from the exec session, which ends with this script
+setsid docker-entrypoint.sh postgres > /tmp/postgres.log 2>&1 < /dev/null &
@@ -7,4 +7,4 @@ mkfifo ../container/container-$NEW_ID/faults.fifo
 touch ../container/container-$NEW_ID/lazyfs.log
 touch ../container/container-$NEW_ID/postgres.log
 
-cp -r ../container/container-$TEMPLATE_ID/persisted ../container/container-$NEW_ID/persisted
+cp -r --reflink=auto ../container/container-$TEMPLATE_ID/persisted ../container/container-$NEW_ID/persisted
@@ -0,0 +1,5 @@
+CONTAINER_ID=$1
+# stop | start
+PHASE=$2
+
+docker exec -t lazypostgres-$CONTAINER_ID sh /restart-postgres.sh $PHASE
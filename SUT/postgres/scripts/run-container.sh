@@ -14,6 +14,7 @@ docker run -dit \
     --memory=1.5gb \
     --shm-size=500mb \
     --name lazypostgres-$CONTAINER_ID \
+    --label ctf.run="${CTF_RUN}" \
     --device /dev/fuse \
     --cap-add SYS_ADMIN \
     --security-opt apparmor:unconfined \
@@ -11,6 +11,7 @@ docker run -dit \
     --memory=1gb \
     --shm-size=500mb \
     --name lazysqlite-$CONTAINER_ID \
+    --label ctf.run="${CTF_RUN}" \
     --device /dev/fuse \
     --cap-add SYS_ADMIN \
     --security-opt apparmor:unconfined \
@@ -1,10 +1,14 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import export
 import itertools
 import json
-import queue
+import math
+import re
 import shared
 import shutil
-from threading import Thread
+import signatures
 import traceback
 from utils import *
 
@@ -15,12 +19,75 @@ test_db = {
 
 parents = {}
 results = {}
-q = queue.Queue()
+templates = {}
+pending = {}
+# (fingerprint of the persisted data, hash of the expected content) -> outcome of its verification
+crashStates = {}
+# seed -> {hash of starting content and configuration: file ops of the fault-free run}, see cachedFileOps
+fileOpsCache = {}
+# seed -> {"new": coverage features of its fault-free run, "recovery": ones of its restarts}
+coverage = {}
+# seeds whose fault-free run was started, the others were dropped with the budget and leave no results
+startedSeeds = set()
+admitting = None
+# tasks allowed in flight, shared.CONCURRENT_TESTS unless adapted to the host at runtime
+limit = shared.CONCURRENT_TESTS
+running = 0
+capacity = asyncio.Condition()
+# (priority, insertion order, task), lower priorities first and FIFO among equal ones
+q = asyncio.PriorityQueue()
+order = itertools.count()
+# queued tasks with a priority below SEED_PRIORITY, which new seeds wait for in budget mode
+urgent = 0
+# unfinished tasks with a priority above SEED_PRIORITY, which new seeds don't wait for without --budget either
+deferred = 0
+# time.monotonic() at which the budget is exhausted, None without --budget
+deadline = None
+# time.monotonic() at which the workers were started, and the seconds run before that by the run resumed
+started = time.monotonic()
+resumedElapsed = 0
+# result classes seen so far in this campaign, see noteOutcome
+resultClasses = set()
+# all seeds of a sharded campaign, see shardSeeds
+campaignSeeds = None
+# template with the empty test table that the seeds are cloned from, see baseTemplate
+base = None
+baseLock = asyncio.Lock()
 
 #########
 # UTILS #
 #########
 
+def getAnalysisConfiguration():
+    """everything besides seed and starting content that the file ops of a fault-free run depend on"""
+    return {
+        "sut": shared.SUT,
+        "syncMethod": shared.SYNC_METHOD,
+        "checkpoint": shared.CHECKPOINT,
+        "numTransactions": shared.NUM_TRANSACTIONS,
+        "concurrentTransactions": shared.CONCURRENT_TRANSACTIONS,
+        "transactionSize": shared.TRANSACTION_SIZE,
+        "statementSize": shared.STATEMENT_SIZE,
+        "pCommit": shared.P_COMMIT,
+        "pInsert": shared.P_INSERT,
+        "pUpdate": shared.P_UPDATE,
+        "pSerializationFailure": shared.P_SERIALIZATION_FAILURE
+    }
+
+def cachedFileOps(seed, key):
+    if not seed in fileOpsCache:
+        path = f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-cache.json"
+        if os.path.exists(path):
+            with open(path) as f:
+                fileOpsCache[seed] = json.load(f)
+        else:
+            fileOpsCache[seed] = {}
+    return fileOpsCache[seed].get(key)
+
+def cacheFileOps(seed, key, files):
+    fileOpsCache[seed][key] = files
+    dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-cache.json", json.dumps(fileOpsCache[seed], indent=4), force=True)
+
 def getTestMetadata():
     return {
         "targetFile": shared.FILE,
@@ -39,6 +106,13 @@ def copyLogs(seed, id, restarts=0):
         os.path.abspath(f"logs/{shared.SUT}/{shared.TEST_RUN}/{seed}/raw/{id}-lazyfs-{restarts}.log")
     )
 
+def copyContainerLogs(sourceID, targetID):
+    for name in [shared.SUT, "lazyfs"]:
+        shutil.copyfile(
+            os.path.abspath(f"SUT/{shared.SUT}/container/container-{sourceID}/{name}.log"),
+            os.path.abspath(f"SUT/{shared.SUT}/container/container-{targetID}/{name}.log")
+        )
+
 def copyVisualization(seed, id, resType, resNum="0"):
     if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/visualization/{resType}"):
         os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/visualization/{resType}", exist_ok=True)
@@ -69,6 +143,8 @@ def dumpTestMetadata(seed, id, testMetadata, parentID=""):
 def logAll(seed, id, metadata, log, restarts=0, parentID=""):
     if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw"):
         os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw", exist_ok=True)
+    if "oldSnapshots" in metadata:
+        metadata = dict(metadata, oldSnapshots=metadata["oldSnapshots"].export())
     dumpIntoFile(
         f"logs/{shared.SUT}/{shared.TEST_RUN}/{seed}/raw/{id}.json",
         json.dumps({"metadata": metadata, "log": log, "parentID": parentID}, indent=4)
@@ -83,13 +159,74 @@ def logAll(seed, id, metadata, log, restarts=0, parentID=""):
 # SEED BENCHMARK #
 ##################
 
-def runSeeds(makeLog, seeds):
+def runSeeds(makeLog, seeds, resume=None):
+    asyncio.run(runCampaign(makeLog, seeds, resume))
+
+async def runCampaign(makeLog, seeds, resume=None):
+    """runs the seeds, or continues the run named resume where its journal ends"""
     
-    shared.TEST_RUN = "test-" + getFormattedTimestamp()
+    shared.TEST_RUN = "test-" + getFormattedTimestamp() if resume is None else resume
     
     if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}"):
         os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}", exist_ok=True)
+    lockRun(resume=resume is not None)
+    
+    if resume is None:
+        dumpConfiguration(makeLog, seeds)
+        state = None
+    else:
+        state = readJournal()
+        reapOrphans(keep=[id for s in state.values() for id in s["templates"]])
+    
+    buildSUTImage(wal_sync_method=shared.SYNC_METHOD, resume=resume is not None)
+    
+    # container control runs on the event loop, only the blocking SQL and file work is handed to threads
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2 * shared.CONCURRENT_TESTS + 4))
     
+    global limit, deadline, started
+    limit = shared.CONCURRENT_TESTS
+    started = time.monotonic()
+    # a resumed run only gets what is left of its budget
+    deadline = started + shared.BUDGET - resumedElapsed if shared.BUDGET > 0 else None
+    if deadline is not None and resumedElapsed >= shared.BUDGET:
+        info("Budget exhausted before the run was resumed, only writing the results so far")
+    if shared.ADAPTIVE_CONCURRENCY:
+        controller = asyncio.create_task(adaptConcurrency())
+    
+    workers = startWorkers()
+    
+    if state is not None:
+        await resumeSeeds(state, makeLog)
+    
+    for (batch, seed) in enumerate(seeds):
+        if state is not None and seed in state:
+            continue
+        if os.path.exists(".terminate"):
+            info("Terminating")
+            os.remove(".terminate")
+            break
+        
+        # admit the next seed once the previous one is set up and the pool has idle workers
+        async with capacity:
+            try:
+                await asyncio.wait_for(capacity.wait_for(canAdmit), timeout=None if deadline is None else deadline - time.monotonic())
+            except TimeoutError:
+                info("Budget exhausted, admitting no further seeds")
+                break
+            admit(seed)
+            journal({"event": "seed", "seed": seed, "batch": batch})
+            enqueue(seed, runSeed, (batch, seed, makeLog), 0 if deadline is None else SEED_PRIORITY)
+    
+    await q.join()
+    await stopWorkers(workers)
+    if shared.ADAPTIVE_CONCURRENCY:
+        controller.cancel()
+    
+    await flushJournal()
+    cleanupAll()
+    unlockRun()
+
+def dumpConfiguration(makeLog, seeds):
     dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/configuration.json", json.dumps({
         "num_transactions": shared.NUM_TRANSACTIONS,
         "concurrent_transactions_avg": shared.CONCURRENT_TRANSACTIONS[0],
@@ -113,119 +250,399 @@ def runSeeds(makeLog, seeds):
         "timing": shared.TIMING,
         "recursion_depth": shared.RECURSION_DEPTH,
         "recursion_factor": shared.RECURSION_FACTOR,
+        "warm_pool": shared.WARM_POOL,
+        "capture": shared.CAPTURE,
+        "bisect": shared.BISECT,
+        "dedup": shared.DEDUPLICATE,
+        "coverage": shared.COVERAGE,
+        "adaptive": shared.ADAPTIVE_CONCURRENCY,
+        "budget": shared.BUDGET,
+        "restart_in_place": shared.RESTART_IN_PLACE,
+        "journal": shared.JOURNAL,
+        "plan_cache": shared.PLAN_CACHE,
+        # host settings, so that --resume finds the containers and environments of the run again
+        "container_root": shared.CONTAINER_ROOT,
+        "container_backend": shared.CONTAINER_BACKEND,
+        "port_range": f"{shared.PORT_RANGE[0]}-{shared.PORT_RANGE[1]}",
+        "image_cache": shared.IMAGE_CACHE,
+        "shard": None if shared.SHARD is None else f"{shared.SHARD[0]}/{shared.SHARD[1]}",
         "sut": shared.SUT,
         "seed": seeds
     }, indent=2))
+    if shared.SHARD is not None:
+        dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/shard.json", json.dumps({
+            "shard": shared.SHARD[0],
+            "shards": shared.SHARD[1],
+            "seeds": seeds,
+            "campaign": campaignSeeds
+        }, indent=2))
 
-    buildSUTImage(wal_sync_method=shared.SYNC_METHOD)
-    for (batch, seed) in enumerate(seeds):
-        if os.path.exists(".terminate"):
-            info("Terminating")
-            os.remove(".terminate")
-            break
-        
-        results.clear()
-        parents.clear()
-        
-        debug("seed", seed, level=1)
-        
-        parentID = createAndPrepareContainer()
+async def runSeed(batch, seed, makeLog):
+    setThreadId(batch, "-")
+    
+    debug("seed", seed, level=1)
+    startedSeeds.add(seed)
+    
+    try:
+        parentID = await duplicateContainer(await baseTemplate())
+        templates[seed].append(parentID)
     
         debug("running workload without injected faults", level=1)
 
-        duplicateID = duplicateContainer(parentID)
-        port = runContainer(duplicateID)
+        duplicateID = await duplicateContainer(parentID)
+        port = await runContainer(duplicateID)
 
-        if not waitUntilAvailable(duplicateID, port, timeout=90):
+        if not await waitUntilAvailable(duplicateID, port, timeout=90):
             error("container didn't start, seed", seed)
-            cleanupContainer(duplicateID)
+            await cleanupContainer(duplicateID)
             return
 
-        (content, metadata, log) = runWorkload(port, duplicateID, seed, True)
+        (content, metadata, log) = await asyncio.to_thread(runWorkload, port, duplicateID, seed, True)
 
         if not metadata["successful"]:
             error("first run failed, seed", seed)
             if makeLog in ["all", "failed"]:
-                mergeLogs(metadata, log, duplicateID)
-                logAll(seed, duplicateID, metadata, log)
-            cleanupContainer(duplicateID)
+                await asyncio.to_thread(mergeLogs, metadata, log, duplicateID)
+                await asyncio.to_thread(logAll, seed, duplicateID, metadata, log)
+            await cleanupContainer(duplicateID)
             return
 
         cth = traceHash(log)
         debug("correct trace hash:", cth, level=1)
 
-        stopSUT(duplicateID)
+        await stopSUT(duplicateID)
 
-        lazyfsLogs = readLogs(duplicateID, "lazyfs")
-        cleanupContainer(duplicateID)
+        lazyfsLogs = await asyncio.to_thread(readLogs, duplicateID, "lazyfs")
+        sutLogs = await asyncio.to_thread(readLogs, duplicateID, shared.SUT)
+        await cleanupContainer(duplicateID)
 
-        files = extractFiles(lazyfsLogs)
+        files = await asyncio.to_thread(extractFiles, lazyfsLogs)
         if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw"):
             os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw", exist_ok=True)
-        dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-{duplicateID}.json", json.dumps({"parent": parentID, "fileOps": files}, indent=4), force=True)
+        await asyncio.to_thread(dumpIntoFile, f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-{duplicateID}.json", json.dumps({"parent": parentID, "fileOps": files}, indent=4), force=True)
 
         if shared.STEPS == 0:
-            continue
-        
-        hurdles = getHurdles(files, 0, shared.STEPS)
+            return
         
-        for (index, hurdle) in enumerate(hurdles):
-            q.put(Thread(target=runIteration, args=(duplicateID, parentID, [], batch, str(index), seed, hurdle, makeLog, max(int(shared.RECURSION_DEPTH), 0), max(int(shared.STEPS * shared.RECURSION_FACTOR), 1))))
+        if shared.COVERAGE:
+            # features are extracted in a thread, but only counted on the event loop, which owns signatures.seen
+            features = await asyncio.to_thread(runFeatures, lazyfsLogs, sutLogs)
+            coverage[seed] = {"new": signatures.novel(features), "recovery": 0}
+            if coverage[seed]["new"] == 0:
+                info("seed", seed, "adds no new coverage, exploring its crash states last")
+            else:
+                debug("seed adds", coverage[seed]["new"], "new coverage features", level=1)
         
-        threads = []
+        hurdles = getHurdles(files, 0, shared.STEPS)
         
-        # this is fine, this thread is the only consumer + any thread that enqueues new ones does so before terminating
-        while q.qsize() > 0:
-            
-            for _ in range(shared.CONCURRENT_TESTS):
-                if q.qsize() == 0:
-                    break
-                threads.append(q.get())
+        await enqueueHurdles(seed, duplicateID, parentID, [], batch, "", hurdles, makeLog, max(int(shared.RECURSION_DEPTH), 0), max(int(shared.STEPS * shared.RECURSION_FACTOR), 1), iterationPriority(seed, 0, None, False))
+    
+    finally:
+        await admitted(seed)
 
-            info("Starting group of", len(threads))
-            
-            for t in threads:
-                t.start()
-            
-            for t in threads:
-                t.join()
-            
-            threads.clear()
-            
-            info("Group finished,", q.qsize(), "queued")
-        
-        dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/testResult.json", json.dumps({"parents": parents, "results": results}, indent=4), force=True)
-        cleanupEnvs()
-        
-        info("Exporting batch")
-        
-        os.mkdir(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/visualization")
-        
+async def finishSeed(seed):
+    """writes the test results of a seed whose iterations have all finished and exports them"""
+    
+    if not seed in startedSeeds:
+        # a testResult.json without results would make it look cheap to seedCosts, the journal still lists it as admitted
+        del results[seed]
+        del parents[seed]
+        del templates[seed]
+        info("Seed", seed, "dropped before it started")
+        return
+    startedSeeds.discard(seed)
+    
+    testResult = {"parents": parents[seed], "results": results[seed]}
+    if seed in coverage:
+        testResult["coverage"] = coverage.pop(seed)
+    dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/testResult.json", json.dumps(testResult, indent=4), force=True)
+    
+    await asyncio.gather(*[releasePool(id) for id in templates[seed]])
+    await asyncio.gather(*[cleanupEnv(id) for id in templates[seed]])
+    
+    info("Exporting seed", seed)
+    
+    os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/visualization", exist_ok=True)
+    
+    if os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw"):
         jsonfiles = [f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/{item}" for item in os.listdir(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw") if (item.endswith(".json") and not item.startswith("testfiles"))]
-        
-        for file in jsonfiles:
-            id = file.split(".json")[0].split("/")[-1]
-            export.collectAndExport(file)
-            resType = results[id]["result"]
-            resNum = results[id]["number"]
-            copyVisualization(seed, id, resType, resNum)
+    else:
+        jsonfiles = []
+    
+    for file in jsonfiles:
+        id = file.split(".json")[0].split("/")[-1]
+        await asyncio.to_thread(export.collectAndExport, file)
+        if not id in results[seed]: # log of a failed first run
+            continue
+        resType = results[seed][id]["result"]
+        resNum = results[seed][id]["number"]
+        await asyncio.to_thread(copyVisualization, seed, id, resType, resNum)
+    
+    for id in templates[seed]:
+        shutil.rmtree(f"logs/{shared.SUT}/{shared.TEST_RUN}/templates/{id}", ignore_errors=True)
+    journal({"event": "finished", "seed": seed})
+    
+    del results[seed]
+    del parents[seed]
+    del templates[seed]
+    fileOpsCache.pop(seed, None)
+    
+    info("Seed", seed, "finished")
 
-        info("Batch finished")
+############
+# SHARDING #
+############
+
+def seedCosts(seeds):
+    """iterations each seed took in the latest earlier run of the SUT containing it, the average for seeds not run before"""
+    costs = {}
+    wanted = {str(seed): seed for seed in seeds}
+    if os.path.isdir(f"logs/{shared.SUT}"):
+        # test-[timestamp], merged-[timestamp] etc. by when they were started, later ones overwrite
+        for run in sorted(os.listdir(f"logs/{shared.SUT}"), key=lambda run: run[run.find("["):] if "[" in run else ""):
+            if not os.path.isdir(f"logs/{shared.SUT}/{run}"):
+                continue
+            for entry in os.listdir(f"logs/{shared.SUT}/{run}"):
+                if entry in wanted and os.path.exists(f"logs/{shared.SUT}/{run}/{entry}/testResult.json"):
+                    with open(f"logs/{shared.SUT}/{run}/{entry}/testResult.json") as f:
+                        # the fault-free run plus one per crash iteration
+                        costs[wanted[entry]] = 1 + len(json.load(f)["results"])
+    average = sum(costs.values()) / len(costs) if len(costs) > 0 else 1
+    return {seed: costs.get(seed, average) for seed in seeds}
+
+def shardSeeds(seeds):
+    """the seeds of shard shared.SHARD, partitioned by their estimated cost
     
-    cleanupAll()
+    The most expensive seeds are assigned first, each to the shard with the least cost so far, so seeds
+    without earlier runs are dealt round robin. Every host has to see the same earlier runs in logs/<sut>,
+    e.g. a campaign merged by merge.py, to partition alike.
+    """
+    global campaignSeeds
+    (index, count) = shared.SHARD
+    costs = seedCosts(seeds)
+    loads = [0] * count
+    shards = [[] for _ in range(count)]
+    for (position, seed) in sorted(enumerate(seeds), key=lambda item: (-costs[item[1]], item[0])):
+        shard = loads.index(min(loads))
+        loads[shard] += costs[seed]
+        shards[shard].append((position, seed))
+    campaignSeeds = list(seeds)
+    info("Shard", f"{index}/{count}", "runs", len(shards[index - 1]), "of", len(seeds), "seeds, estimated cost", round(loads[index - 1]), "of", round(sum(loads)))
+    return [seed for (_, seed) in sorted(shards[index - 1])]
+
+##############
+# SCHEDULING #
+##############
+
+def admit(seed):
+    global admitting
+    admitting = seed
+    results[seed] = {}
+    parents[seed] = {}
+    templates[seed] = []
+    pending[seed] = 0
+
+async def admitted(seed):
+    global admitting
+    async with capacity:
+        if admitting == seed:
+            admitting = None
+        capacity.notify_all()
+
+def canAdmit():
+    if admitting is not None:
+        return False
+    if deadline is None:
+        # the work of seeds ranked last by --coverage doesn't hold back new seeds, the templates of at most 2 * limit seeds are kept
+        return sum(pending.values()) - deferred < limit and len(pending) < 2 * limit
+    # in budget mode, seeds compete with the queued iterations by priority, with a bound on the disk their templates use
+    return urgent < limit and len(pending) < 2 * limit
+
+def budgetExhausted():
+    return deadline is not None and time.monotonic() >= deadline
+
+def enqueue(seed, fun, args, priority=0):
+    global urgent, deferred
+    pending[seed] += 1
+    if priority < SEED_PRIORITY:
+        urgent += 1
+    elif priority > SEED_PRIORITY:
+        deferred += 1
+    q.put_nowait((priority, next(order), (seed, fun, args)))
 
-def createAndPrepareContainer():
-    id = prepHostEnvironment()
-    port = runContainer(id)
-    waitUntilAvailable(id, port, 90, kill=True)
-    create(test_db["name"], test_db["schema"], port)
-    stopContainer(id)
+# priority of a new seed, between the first level of hurdles and deeper ones
+SEED_PRIORITY = 1
+
+def iterationPriority(seed, depth, outcome, novel):
+    """estimated value of exploring the hurdles of seed below an outcome at depth, lower first
+    
+    Without --budget, all tasks are run in the order they were queued. Otherwise shallow levels come first,
+    levels below a result class not seen before are moved up and levels below correct content down.
+    With --coverage, the levels of seeds whose runs added new coverage features are moved up in either
+    mode, and those of seeds that added none yet come after all others.
+    """
+    priority = 0
+    if deadline is not None:
+        priority = depth
+        if novel:
+            priority -= 1
+        elif outcome is not None and outcome.startswith("correct"):
+            priority += 1
+    if seed in coverage:
+        if coverage[seed]["new"] + coverage[seed]["recovery"] > 0:
+            priority -= 1
+        else:
+            priority += max(int(shared.RECURSION_DEPTH), 0) + 2
+    return priority
+
+def noteOutcome(outcome):
+    """records the class of an outcome, returns whether it is the first of its class in this campaign"""
+    if outcome is None:
+        return False
+    resultClass = re.sub(r"\d+", "#", outcome)
+    novel = not resultClass in resultClasses
+    resultClasses.add(resultClass)
+    return novel
+
+async def taskFinished(seed):
+    async with capacity:
+        pending[seed] -= 1
+        finished = pending[seed] == 0
+        if finished:
+            del pending[seed]
+        capacity.notify_all()
+    if finished:
+        await finishSeed(seed)
+
+def startWorkers():
+    """starts a pool of shared.CONCURRENT_TESTS worker tasks consuming the global queue
+    
+    A worker picks up the next queued task as soon as its current one has finished and a slot below
+    limit is free. Tasks enqueue their children before they finish, so the queue is drained once
+    q.join() returns.
+    """
+    workers = [asyncio.create_task(worker(n)) for n in range(shared.CONCURRENT_TESTS)]
+    
+    info("Starting", len(workers), "workers")
+    
+    return workers
+
+async def stopWorkers(workers):
+    for _ in workers:
+        q.put_nowait((math.inf, next(order), None))
+    
+    await asyncio.gather(*workers)
+    
+    info("All workers finished")
+
+async def worker(n):
+    global running, urgent, deferred
+    while True:
+        # take a slot first, so tasks stay queued while the limit is lowered
+        async with capacity:
+            await capacity.wait_for(lambda: running < limit)
+            running += 1
+        (priority, _, task) = await q.get()
+        if task is None:
+            q.task_done()
+            await releaseSlot()
+            return
+        if priority < SEED_PRIORITY:
+            urgent -= 1
+        (seed, fun, args) = task
+        try:
+            if budgetExhausted():
+                # finish the seed with the work completed so far
+                debug("budget exhausted, dropping queued", fun.__name__, "of seed", seed, level=1)
+            else:
+                await fun(*args)
+        except (Exception, SystemExit) as e:
+            error(type(e), "exception occurred in worker", n, traceback.format_exc())
+        if priority > SEED_PRIORITY:
+            deferred -= 1
+        try:
+            await taskFinished(seed)
+        except (Exception, SystemExit) as e:
+            error(type(e), "exception occurred while finishing seed", seed, traceback.format_exc())
+        finally:
+            q.task_done()
+            await releaseSlot()
+            debug("worker", n, "finished task,", q.qsize(), "queued", level=2)
+
+async def releaseSlot():
+    global running
+    async with capacity:
+        running -= 1
+        capacity.notify_all()
+
+async def adaptConcurrency():
+    """adapts the number of tasks in flight to the host, up to shared.CONCURRENT_TESTS
+    
+    Every shared.ADAPT_INTERVAL seconds, the host is sampled. The limit is cut by a quarter as soon as
+    memory, the container root or the CPUs run short or containers take much longer to start than they
+    did at best, and is raised by one while all of them have headroom left.
+    """
+    global limit
+    footprint = containerFootprint()
+    r = await asyncio.to_thread(hostResources)
+    fastest = None
+    async with capacity:
+        limit = max(1, min(shared.CONCURRENT_TESTS, int(r["memAvailable"] // footprint)))
+        capacity.notify_all()
+    info("Starting with", limit, "concurrent tests")
+    while True:
+        await asyncio.sleep(shared.ADAPT_INTERVAL)
+        r = await asyncio.to_thread(hostResources)
+        latency = r["startLatency"]
+        if latency is not None:
+            fastest = latency if fastest is None else min(fastest, latency)
+        overloaded = r["memAvailable"] < footprint or r["rootFree"] < 0.1 * r["rootSize"] or r["load"] > 1.5 or (latency is not None and latency > 2 * fastest)
+        headroom = r["memAvailable"] > 2 * footprint and r["rootFree"] > 0.25 * r["rootSize"] and r["load"] < 1.0 and (latency is None or latency < 1.5 * fastest)
+        debug("host:", f"{r['memAvailable'] / 1024 ** 3:.1f}GiB memory,", f"{r['rootFree'] / 1024 ** 3:.1f}GiB container root,", f"load {r['load']:.2f},", f"start latency {latency}", level=2)
+        if overloaded:
+            new = max(1, limit * 3 // 4)
+        elif headroom:
+            new = min(shared.CONCURRENT_TESTS, limit + 1)
+        else:
+            new = limit
+        if new != limit:
+            info("Adjusting concurrent tests from", limit, "to", new)
+            async with capacity:
+                limit = new
+                capacity.notify_all()
+
+async def createAndPrepareContainer():
+    id = await prepHostEnvironment()
+    port = await runContainer(id)
+    await waitUntilAvailable(id, port, 90, kill=True)
+    await asyncio.to_thread(create, test_db["name"], test_db["schema"], port)
+    await stopContainer(id)
     return id
 
-def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed, hurdle, makeLog, remainingDepth, steps):
+async def baseTemplate():
+    """the environment with the empty test table, prepared once per campaign
     
-    tls.batch = batch
-    tls.number = number
+    Its persisted data only depends on the SUT image and the table, so it is cached along with the image.
+    """
+    global base
+    async with baseLock:
+        if base is not None:
+            return base
+        tag = imageTag(shared.SYNC_METHOD)
+        key = md5(json.dumps(test_db).encode()).hexdigest()[:16]
+        id = await prepHostEnvironment()
+        if await asyncio.to_thread(restoreCachedTemplate, id, tag, key):
+            debug("reusing cached template with the empty test table", level=1)
+        else:
+            await cleanupEnv(id)
+            id = await createAndPrepareContainer()
+            await asyncio.to_thread(cacheTemplate, id, tag, key)
+        base = id
+        return base
+
+async def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed, hurdle, makeLog, remainingDepth, steps, captured=None):
+    
+    setThreadId(batch, number)
     
     depth = shared.RECURSION_DEPTH - remainingDepth
     file = shared.FILE[depth] if len(shared.FILE) > depth else shared.FILE[-1]
@@ -236,7 +653,6 @@ def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed,
     
     cmd = "\n".join(["\n[[injection]]", "type = \"clear-cache\"", f"from = \"/tmp/lazyfs.root/{file}\"", f"timing = \"{timing}\"", f"op = \"{operation}\"", f"occurrence = {hurdle}", "crash = true"])
     
-    childID = duplicateContainer(parentTemplateID)
     testMetadata = {
         "cmd": cmd,
         "hurdle": hurdle,
@@ -250,101 +666,152 @@ def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed,
         "operation": operation
     }
     
-    port = runContainer(childID, crashcmd=cmd)
-    startup = False
-    metadata, log = {}, []
-    if not waitUntilAvailable(childID, port, 90, supressErrors=True):
-        info("no startup")
-        testMetadata["result"] = "no-start"
-        testMetadata["id"] = childID
-        parents[childID] = parentID
-        results[childID] = testMetadata
-        stopContainer(childID, supressErrors=True)
-        if makeLog in ["all", "failed"]:
-            addLog(testMetadata, childID, "startupLog")
-            copyLogs(seed, childID, depth)
-        content = parentContent
+    # whether the SUT of the crashed child is restarted in place for the verification
+    restartable = False
     
-    else:
-        verify(shared.DB_TABLENAME, parentContent, port)
-        (content, metadata, log) = runWorkload(port, childID, seed, True, dbContent=parentContent)
-        mergeLogs(metadata, log, childID)
+    if captured is not None:
+        # crash state captured during a single run of the workload, see captureIterations
+        (childID, content, metadata, log) = (captured["id"], captured["content"], captured["metadata"], captured["log"])
+        await asyncio.to_thread(mergeLogs, metadata, log, childID)
         startup = True
         testMetadata["traceHash"] = traceHash(log)
-        stopContainer(childID, supressErrors=True)
-        if metadata["successful"]:
-            testMetadata["result"] = "initial-success"
-            metadata["testMetadata"] = testMetadata
+        testMetadata["captured"] = True
+        if makeLog in ["all", "failed"]:
+            await asyncio.to_thread(copyLogs, seed, childID, depth)
+    
+    else:
+        childID = await acquireDuplicate(parentTemplateID)
+        port = await runContainer(childID, crashcmd=cmd)
+        startup = False
+        metadata, log = {}, []
+        if not await waitUntilAvailable(childID, port, 90, supressErrors=True):
+            info("no startup")
+            testMetadata["result"] = "no-start"
+            testMetadata["id"] = childID
+            parents[seed][childID] = parentID
+            results[seed][childID] = testMetadata
+            await stopContainer(childID, supressErrors=True)
+            if makeLog in ["all", "failed"]:
+                await asyncio.to_thread(addLog, testMetadata, childID, "startupLog")
+                await asyncio.to_thread(copyLogs, seed, childID, depth)
+            content = parentContent
+    
+        else:
+            await asyncio.to_thread(verify, shared.DB_TABLENAME, parentContent, port)
+            (content, metadata, log) = await asyncio.to_thread(runWorkload, port, childID, seed, True, dbContent=parentContent)
+            await asyncio.to_thread(mergeLogs, metadata, log, childID)
+            startup = True
+            testMetadata["traceHash"] = traceHash(log)
+            restartable = shared.RESTART_IN_PLACE and not metadata["successful"] and supportsRestart()
+            if restartable:
+                await quiesceSUT(childID)
+            else:
+                await stopContainer(childID, supressErrors=True)
+            if metadata["successful"]:
+                testMetadata["result"] = "initial-success"
+                metadata["testMetadata"] = testMetadata
+                if makeLog == "all":
+                    await asyncio.to_thread(logAll, seed, childID, metadata, log, depth, parentID)
+                parents[seed][childID] = parentID
+                results[seed][childID] = testMetadata
+                info("successful workflow, early return")
+                return
+            else:    
+                if makeLog in ["all", "failed"]:
+                    await asyncio.to_thread(copyLogs, seed, childID, depth)
+    
+    stateKey = None
+    if shared.DEDUPLICATE:
+        # the outcome only depends on the crash state and what the workload expects of it
+        expected = [content, metadata.get("altContent"), metadata["oldSnapshots"].export()] if startup else [content]
+        stateKey = (await asyncio.to_thread(fingerprintPersisted, childID), md5(json.dumps(expected).encode()).hexdigest())
+        if stateKey in crashStates:
+            known = crashStates[stateKey]
+            if restartable:
+                await stopContainer(childID, supressErrors=True)
+            info("crash state already verified in", known["id"], "reusing", known["result"])
+            testMetadata["result"] = known["result"]
+            if "details" in known:
+                testMetadata["details"] = known["details"]
+            testMetadata["deduplicated"] = known["id"]
+            testMetadata["id"] = childID
+            parents[seed][childID] = parentID
+            results[seed][childID] = testMetadata
             if makeLog == "all":
-                logAll(seed, childID, metadata, log, depth, parentID)
-            parents[childID] = parentID
-            results[childID] = testMetadata
-            info("successful workflow, early return")
+                await asyncio.to_thread(dumpTestMetadata, seed, childID, testMetadata, parentID)
+            if not known["proceed"]:
+                await cleanupContainer(childID)
+                return
+            await exploreChildren(seed, parentID, childID, None, known["content"], batch, number, depth, makeLog, remainingDepth, steps, known["result"])
             return
-        else:    
-            if makeLog in ["all", "failed"]:
-                copyLogs(seed, childID, depth)
     
-    debug("Starting duplicate for db content verification", level=1)
+    if restartable:
+        debug("Restarting SUT in place for db content verification", level=1)
+        # recovery changes the persisted data, a snapshot of the crash state takes over as the child
+        (childID, verificationDuplicateID) = (await duplicateContainer(childID), childID)
+        await restartSUT(verificationDuplicateID)
     
-    verificationDuplicateID = duplicateContainer(childID)
-    port = runContainer(verificationDuplicateID)
+    else:
+        debug("Starting duplicate for db content verification", level=1)
+        
+        verificationDuplicateID = await duplicateContainer(childID)
+        port = await runContainer(verificationDuplicateID)
 
-    parents[verificationDuplicateID] = parentID
+    parents[seed][verificationDuplicateID] = parentID
     testMetadata["template"] = childID
     testMetadata["id"] = verificationDuplicateID
     
     if startup:
 
-        if not waitUntilAvailable(verificationDuplicateID, port, 90, supressErrors=True):
+        if not await waitUntilAvailable(verificationDuplicateID, port, 90, supressErrors=True):
             info("verification duplicate didn't restart, early return")
             del metadata["oldSnapshots"]
             if "altContent" in metadata:
                 del metadata["altContent"]
             testMetadata["result"] = "no-restart"
             metadata["testMetadata"] = testMetadata
-            results[verificationDuplicateID] = testMetadata
+            results[seed][verificationDuplicateID] = testMetadata
             if makeLog in ["all", "failed"]:
-                stopContainer(verificationDuplicateID, supressErrors=True)
-                addLog(metadata, verificationDuplicateID)
-                logAll(seed, verificationDuplicateID, metadata, log, depth, parentID)
-            cleanupContainer(verificationDuplicateID)
-            cleanupContainer(childID)
+                await stopContainer(verificationDuplicateID, supressErrors=True)
+                await asyncio.to_thread(addLog, metadata, verificationDuplicateID)
+                await asyncio.to_thread(logAll, seed, verificationDuplicateID, metadata, log, depth, parentID)
+            rememberCrashState(stateKey, verificationDuplicateID, testMetadata, content, False)
+            await asyncio.gather(cleanupContainer(verificationDuplicateID), cleanupContainer(childID))
             return
 
-        if verify(shared.DB_TABLENAME, content, port, supressErrors=True):
+        await recordRecoveryCoverage(seed, verificationDuplicateID)
+        
+        if await asyncio.to_thread(verify, shared.DB_TABLENAME, content, port, supressErrors=True):
             info("correct content", ("lost-commit" if "altContent" in metadata else ""))
             testMetadata["result"] = ("correct-content" + ("; lost-commit" if "altContent" in metadata else ""))
             del metadata["oldSnapshots"]
             if "altContent" in metadata:
                 del metadata["altContent"]
             metadata["testMetadata"] = testMetadata
-            results[verificationDuplicateID] = testMetadata
-            stopContainer(verificationDuplicateID, supressErrors=True)
+            results[seed][verificationDuplicateID] = testMetadata
+            await stopContainer(verificationDuplicateID, supressErrors=True)
             if makeLog == "all":
-                addLog(metadata, verificationDuplicateID)
-                logAll(seed, verificationDuplicateID, metadata, log, depth, parentID)
-            cleanupContainer(verificationDuplicateID)
+                await asyncio.to_thread(addLog, metadata, verificationDuplicateID)
+                await asyncio.to_thread(logAll, seed, verificationDuplicateID, metadata, log, depth, parentID)
 
-        elif "altContent" in metadata and verify(shared.DB_TABLENAME, metadata["altContent"], port, supressErrors=True):
+        elif "altContent" in metadata and await asyncio.to_thread(verify, shared.DB_TABLENAME, metadata["altContent"], port, supressErrors=True):
             info("correct content, unconfirmed commit")
             testMetadata["result"] = "correct-content; unconfirmed-commit"
             content = metadata["altContent"]
             del metadata["oldSnapshots"]
             del metadata["altContent"]
             metadata["testMetadata"] = testMetadata
-            results[verificationDuplicateID] = testMetadata
-            stopContainer(verificationDuplicateID, supressErrors=True)
+            results[seed][verificationDuplicateID] = testMetadata
+            await stopContainer(verificationDuplicateID, supressErrors=True)
             if makeLog == "all":
-                addLog(metadata, verificationDuplicateID)
-                logAll(seed, verificationDuplicateID, metadata, log, depth, parentID)
-            cleanupContainer(verificationDuplicateID)
+                await asyncio.to_thread(addLog, metadata, verificationDuplicateID)
+                await asyncio.to_thread(logAll, seed, verificationDuplicateID, metadata, log, depth, parentID)
 
         else:
             oldMatch = False
             lostCommits = 0
             for i in range(len(metadata["oldSnapshots"])):
-                if verify(shared.DB_TABLENAME, metadata["oldSnapshots"][-(i + 1)], port, supressErrors=True):
+                if await asyncio.to_thread(verify, shared.DB_TABLENAME, metadata["oldSnapshots"][-(i + 1)], port, supressErrors=True):
                     oldMatch = True
                     lostCommits = i + 1
                     break
@@ -357,16 +824,15 @@ def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed,
                 if "altContent" in metadata:
                     del metadata["altContent"]
                 metadata["testMetadata"] = testMetadata
-                results[verificationDuplicateID] = testMetadata
-                stopContainer(verificationDuplicateID, supressErrors=True)
+                results[seed][verificationDuplicateID] = testMetadata
+                await stopContainer(verificationDuplicateID, supressErrors=True)
                 if makeLog in ["all", "failed"]:
-                    addLog(metadata, verificationDuplicateID)
-                    logAll(seed, verificationDuplicateID, metadata, log, depth, parentID)
-                cleanupContainer(verificationDuplicateID)
+                    await asyncio.to_thread(addLog, metadata, verificationDuplicateID)
+                    await asyncio.to_thread(logAll, seed, verificationDuplicateID, metadata, log, depth, parentID)
 
             else:
                 try:
-                    actual = dump(shared.DB_TABLENAME, port)
+                    actual = await asyncio.to_thread(dump, shared.DB_TABLENAME, port)
                     mismatch = list(set(content) ^ set(actual))
                     info("incorrect content, early return")
                     testMetadata["result"] = "incorrect-content"
@@ -376,92 +842,332 @@ def runIteration(parentID, parentTemplateID, parentContent, batch, number, seed,
                     testMetadata["result"] = "error"
                     testMetadata["details"] = str(e).strip()
                 metadata["testMetadata"] = testMetadata
-                results[verificationDuplicateID] = testMetadata
-                stopContainer(verificationDuplicateID, supressErrors=True)
+                results[seed][verificationDuplicateID] = testMetadata
+                await stopContainer(verificationDuplicateID, supressErrors=True)
                 if makeLog in ["all", "failed"]:
-                    addLog(metadata, verificationDuplicateID)
-                    logAll(seed, verificationDuplicateID, metadata, log, depth, parentID)
-                cleanupContainer(verificationDuplicateID)
-                cleanupContainer(childID)
+                    await asyncio.to_thread(addLog, metadata, verificationDuplicateID)
+                    await asyncio.to_thread(logAll, seed, verificationDuplicateID, metadata, log, depth, parentID)
+                rememberCrashState(stateKey, verificationDuplicateID, testMetadata, content, False)
+                await asyncio.gather(cleanupContainer(verificationDuplicateID), cleanupContainer(childID))
                 return
     
     else:
         
-        if not waitUntilAvailable(verificationDuplicateID, port, 90, supressErrors=True):
+        if not await waitUntilAvailable(verificationDuplicateID, port, 90, supressErrors=True):
             info("verification duplicate didn't restart, early return")
             testMetadata["result"] = "no-restart"
-            results[verificationDuplicateID] = testMetadata
-            stopContainer(verificationDuplicateID, supressErrors=True)
+            results[seed][verificationDuplicateID] = testMetadata
+            await stopContainer(verificationDuplicateID, supressErrors=True)
             if makeLog in ["all", "failed"]:
-                copyLogs(seed, verificationDuplicateID, depth)
-                addLog(testMetadata, verificationDuplicateID)
-                dumpTestMetadata(seed, verificationDuplicateID, testMetadata, parentID)
-            cleanupContainer(verificationDuplicateID)
-            cleanupContainer(childID)
+                await asyncio.to_thread(copyLogs, seed, verificationDuplicateID, depth)
+                await asyncio.to_thread(addLog, testMetadata, verificationDuplicateID)
+                await asyncio.to_thread(dumpTestMetadata, seed, verificationDuplicateID, testMetadata, parentID)
+            rememberCrashState(stateKey, verificationDuplicateID, testMetadata, content, False)
+            await asyncio.gather(cleanupContainer(verificationDuplicateID), cleanupContainer(childID))
             return
             
-        if verify(shared.DB_TABLENAME, content, port, supressErrors=True):
+        await recordRecoveryCoverage(seed, verificationDuplicateID)
+        
+        if await asyncio.to_thread(verify, shared.DB_TABLENAME, content, port, supressErrors=True):
             info("correct parent content")
             testMetadata["result"] = "correct-parent-content"
-            results[verificationDuplicateID] = testMetadata
-            stopContainer(verificationDuplicateID, supressErrors=True)
+            results[seed][verificationDuplicateID] = testMetadata
+            await stopContainer(verificationDuplicateID, supressErrors=True)
             if makeLog == "all":
-                copyLogs(seed, verificationDuplicateID, depth)
-                addLog(testMetadata, verificationDuplicateID)
-                dumpTestMetadata(seed, verificationDuplicateID, testMetadata, parentID)
-            cleanupContainer(verificationDuplicateID)
+                await asyncio.to_thread(copyLogs, seed, verificationDuplicateID, depth)
+                await asyncio.to_thread(addLog, testMetadata, verificationDuplicateID)
+                await asyncio.to_thread(dumpTestMetadata, seed, verificationDuplicateID, testMetadata, parentID)
             
         else:
             info("incorrect parent content, early return")
             testMetadata["result"] = "incorrect-parent-content"
-            actual = dump(shared.DB_TABLENAME, port)
+            actual = await asyncio.to_thread(dump, shared.DB_TABLENAME, port)
             mismatch = list(set(content) ^ set(actual))
             testMetadata["details"] = {"expected": content, "actual": actual, "mismatch": mismatch}
-            results[verificationDuplicateID] = testMetadata
-            stopContainer(verificationDuplicateID, supressErrors=True)
+            results[seed][verificationDuplicateID] = testMetadata
+            await stopContainer(verificationDuplicateID, supressErrors=True)
             if makeLog in ["all", "failed"]:
-                copyLogs(seed, verificationDuplicateID, depth)
-                addLog(testMetadata, verificationDuplicateID)
-                dumpTestMetadata(seed, verificationDuplicateID, testMetadata, parentID)
-            cleanupContainer(verificationDuplicateID)
-            cleanupContainer(childID)
+                await asyncio.to_thread(copyLogs, seed, verificationDuplicateID, depth)
+                await asyncio.to_thread(addLog, testMetadata, verificationDuplicateID)
+                await asyncio.to_thread(dumpTestMetadata, seed, verificationDuplicateID, testMetadata, parentID)
+            rememberCrashState(stateKey, verificationDuplicateID, testMetadata, content, False)
+            await asyncio.gather(cleanupContainer(verificationDuplicateID), cleanupContainer(childID))
             return
     
+    rememberCrashState(stateKey, verificationDuplicateID, testMetadata, content, True)
+    
+    await exploreChildren(seed, parentID, childID, verificationDuplicateID, content, batch, number, depth, makeLog, remainingDepth, steps, testMetadata["result"])
+
+async def exploreChildren(seed, parentID, childID, verificationDuplicateID, content, batch, number, depth, makeLog, remainingDepth, steps, outcome):
+    """analyses the workload on the crash state of childID and enqueues the next level of hurdles on it
+    
+    verificationDuplicateID is None if the crash state was deduplicated and thus not restarted again.
+    """
+    
+    verified = [] if verificationDuplicateID is None else [cleanupContainer(verificationDuplicateID)]
+    
     if remainingDepth == 0:
         debug("recursion floor reached", level=1)
-        cleanupContainer(childID)
+        await asyncio.gather(*verified, cleanupContainer(childID))
+        return
+    
+    if budgetExhausted():
+        # the next level would only be dropped by the workers
+        debug("budget exhausted, not analysing the next level", level=1)
+        await asyncio.gather(*verified, cleanupContainer(childID))
         return
 
-    debug("Starting duplicate, running next workload without hurdles", level=1)
+    analysisKey = md5(json.dumps([content, getAnalysisConfiguration()]).encode()).hexdigest()
+    files = cachedFileOps(seed, analysisKey)
+    
+    if files is not None:
+        debug("file ops for this content already known, skipping the analysis run", level=1)
+        await asyncio.gather(*verified)
+    
+    else:
+        debug("Starting duplicate, running next workload without hurdles", level=1)
+    
+        # the child is stopped already, so the analysis duplicate can be prepared while the verification duplicate is torn down
+        (analysisDuplicateID, *_) = await asyncio.gather(duplicateContainer(childID), *verified)
+        parents[seed][analysisDuplicateID] = parentID
+        port = await runContainer(analysisDuplicateID)
 
-    analysisDuplicateID = duplicateContainer(childID)
-    parents[analysisDuplicateID] = parentID
-    port = runContainer(analysisDuplicateID)
+        if not await waitUntilAvailable(analysisDuplicateID, port, 90):
+            error("Analysis duplicate container didn't start")
+            await asyncio.gather(cleanupContainer(analysisDuplicateID), cleanupContainer(childID))
+            return
 
-    if not waitUntilAvailable(analysisDuplicateID, port, 90):
-        error("Analysis duplicate container didn't start")
-        cleanupContainer(analysisDuplicateID)
-        cleanupContainer(childID)
-        return
+        _ = await asyncio.to_thread(runWorkload, port, analysisDuplicateID, seed, True, dbContent=content)
 
-    _ = runWorkload(port, analysisDuplicateID, seed, True, dbContent=content)
+        await stopSUT(analysisDuplicateID)
 
-    stopSUT(analysisDuplicateID)
+        lazyfsLogs = await asyncio.to_thread(readLogs, analysisDuplicateID, "lazyfs")
+        await cleanupContainer(analysisDuplicateID)
 
-    lazyfsLogs = readLogs(analysisDuplicateID, "lazyfs")
-    cleanupContainer(analysisDuplicateID)
+        files = await asyncio.to_thread(extractFiles, lazyfsLogs)
+        if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw"):
+            os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw", exist_ok=True)
+        await asyncio.to_thread(dumpIntoFile, f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-{analysisDuplicateID}-{depth}.json", json.dumps({"parent": parentID, "fileOps": files}, indent=4), force=True)
 
-    files = extractFiles(lazyfsLogs)
-    if not os.path.exists(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw"):
-        os.makedirs(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw", exist_ok=True)
-    dumpIntoFile(f"logs/{shared.SUT}/{shared.TEST_RUN}/{str(seed)}/raw/testfiles-{analysisDuplicateID}-{depth}.json", json.dumps({"parent": parentID, "fileOps": files}, indent=4), force=True)
+        cacheFileOps(seed, analysisKey, files)
 
     hurdles = getHurdles(files, depth + 1, steps)
 
     debug("enqueuing", steps, "child threads", level=1)
 
-    for (index, h) in enumerate(hurdles):
-        q.put(Thread(target=runIteration, args=(verificationDuplicateID, childID, content, batch, f"{number}.{index}", seed, h, makeLog, remainingDepth - 1, max(int(steps * shared.RECURSION_FACTOR), 1))))
+    templates[seed].append(childID)
+    priority = iterationPriority(seed, depth + 1, outcome, noteOutcome(outcome))
+    await enqueueHurdles(seed, verificationDuplicateID or childID, childID, content, batch, f"{number}.", hurdles, makeLog, remainingDepth - 1, max(int(steps * shared.RECURSION_FACTOR), 1), priority)
+
+async def recordRecoveryCoverage(seed, id):
+    """counts the recovery log lines of a restarted crash state towards the seed's coverage"""
+    if seed in coverage:
+        features = await asyncio.to_thread(recoveryFeatures, id)
+        coverage[seed]["recovery"] += signatures.novel(features)
+
+def runFeatures(lazyfsLogs, sutLogs):
+    return signatures.lazyfsFeatures(lazyfsLogs) | signatures.logFeatures(sutLogs)
+
+def recoveryFeatures(id):
+    return signatures.logFeatures(readLogs(id, shared.SUT), "recovery")
+
+def rememberCrashState(stateKey, id, testMetadata, content, proceed):
+    """records the outcome of a verified crash state, so identical ones can reuse it"""
+    # failed restarts and dumps may be caused by the host, those are checked again
+    if stateKey is None or testMetadata["result"] in ["no-restart", "error"]:
+        return
+    crashStates[stateKey] = {"id": id, "result": testMetadata["result"], "content": content, "proceed": proceed}
+    if "details" in testMetadata:
+        crashStates[stateKey]["details"] = testMetadata["details"]
+
+async def enqueueHurdles(seed, parentID, templateID, content, batch, prefix, hurdles, makeLog, remainingDepth, steps, priority=0):
+    """enqueues the iterations crashing at hurdles, as a single capture run if enabled for their timing
+    
+    The iterations of one level share a group, which records their outcomes for bisection.
+    """
+    if shared.JOURNAL:
+        await asyncio.to_thread(archiveTemplate, templateID)
+    numbers = {hurdle: f"{prefix}{index}" for (index, hurdle) in reversed(list(enumerate(hurdles)))}
+    journal({"event": "level", "seed": seed, "prefix": prefix, "parentID": parentID, "templateID": templateID, "content": content, "batch": batch, "makeLog": makeLog, "remainingDepth": remainingDepth, "steps": steps, "priority": priority, "hurdles": {numbers[hurdle]: hurdle for hurdle in hurdles}})
+    group = {
+        "seed": seed,
+        "parentID": parentID,
+        "templateID": templateID,
+        "content": content,
+        "batch": batch,
+        "prefix": prefix,
+        "makeLog": makeLog,
+        "remainingDepth": remainingDepth,
+        "steps": steps,
+        "priority": priority,
+        # hurdle -> result, for all finished iterations
+        "outcomes": {},
+        # hurdles finished or in progress
+        "scheduled": set(hurdles),
+        "next": len(hurdles)
+    }
+    depth = shared.RECURSION_DEPTH - remainingDepth
+    timing = shared.TIMING[depth] if len(shared.TIMING) > depth else shared.TIMING[-1]
+    if shared.CAPTURE and timing == "after" and len(hurdles) > 0:
+        warmUp(templateID, 1)
+        enqueue(seed, captureIterations, (group, numbers), priority)
+        return
+    enqueueSeparately(group, numbers, sorted(numbers))
+
+def enqueueSeparately(group, numbers, hurdles):
+    warmUp(group["templateID"], len(hurdles))
+    for hurdle in hurdles:
+        enqueue(group["seed"], runHurdle, (group, numbers[hurdle], hurdle), group["priority"])
+
+async def runHurdle(group, number, hurdle, captured=None):
+    await runIteration(group["parentID"], group["templateID"], group["content"], group["batch"], number, group["seed"], hurdle, group["makeLog"], group["remainingDepth"], group["steps"], captured)
+    group["outcomes"][hurdle] = next((r["result"] for r in results[group["seed"]].values() if r["number"] == number), None)
+    finished = {id: r for (id, r) in results[group["seed"]].items() if r["number"] == number}
+    journal({"event": "hurdle", "seed": group["seed"], "prefix": group["prefix"], "number": number, "hurdle": hurdle, "results": finished, "parents": {id: parents[group["seed"]][id] for id in finished if id in parents[group["seed"]]}})
+    noteOutcome(group["outcomes"][hurdle])
+    if shared.BISECT:
+        bisect(group, hurdle)
+
+def bisect(group, hurdle):
+    """schedules the midpoint towards each finished neighbouring hurdle with a different outcome"""
+    outcome = group["outcomes"][hurdle]
+    if outcome is None:
+        return
+    scheduled = sorted(group["scheduled"])
+    i = scheduled.index(hurdle)
+    for neighbour in scheduled[max(i - 1, 0):i] + scheduled[i + 1:i + 2]:
+        if group["outcomes"].get(neighbour, outcome) == outcome:
+            # same outcome or not finished yet, then the neighbour checks once it is
+            continue
+        (low, high) = sorted((hurdle, neighbour))
+        if high - low <= 1:
+            continue
+        mid = (low + high) // 2
+        number = f"{group['prefix']}{group['next']}"
+        group["next"] += 1
+        group["scheduled"].add(mid)
+        journal({"event": "bisect", "seed": group["seed"], "prefix": group["prefix"], "number": number, "hurdle": mid})
+        debug("outcomes differ between hurdles", low, "and", high, "bisecting at", mid, level=1)
+        warmUp(group["templateID"], 1)
+        enqueue(group["seed"], runHurdle, (group, number, mid), group["priority"])
+
+async def captureIterations(group, numbers):
+    """runs the workload once without crashing and captures the crash state at every hurdle
+    
+    Whenever the lazyfs log shows the next hurdle's occurrence of the target op on the target file, and a
+    later op on that file shows the occurrence has returned (the SUT is assumed to not run ops on the file
+    concurrently), the container is paused. Only if the pause lands exactly on the hurdle, its persisted data,
+    which is what survives a clear-cache crash, is copied into a new environment along with the logs and the
+    progress of the workload. Each captured state is then checked by runIteration as if the container had
+    crashed there. Hurdles the workload ran past before the pause, passed before it started or never reached
+    are left to separate iterations, as are all hurdles after the container fails to unpause.
+    
+    A captured state is the hurdle's crash state plus whatever the SUT fsynced to other files between the
+    hurdle and the pause, as the pause only waits for the next op on the target file.
+    """
+    (seed, parentContent, remainingDepth) = (group["seed"], group["content"], group["remainingDepth"])
+    setThreadId(group["batch"], f"{group['prefix']}*")
+    
+    depth = shared.RECURSION_DEPTH - remainingDepth
+    file = shared.FILE[depth] if len(shared.FILE) > depth else shared.FILE[-1]
+    operation = shared.OP[depth] if len(shared.OP) > depth else shared.OP[-1]
+    remaining = sorted(numbers)
+    
+    debug("capturing crash states at hurdles", remaining, "on", file, "after", operation, level=1)
+    
+    captureID = await acquireDuplicate(group["templateID"])
+    port = await runContainer(captureID)
+    
+    if not await waitUntilAvailable(captureID, port, 90, supressErrors=True):
+        info("capture container didn't start, running hurdles separately")
+        await cleanupContainer(captureID)
+        enqueueSeparately(group, numbers, remaining)
+        return
+    
+    await asyncio.to_thread(verify, shared.DB_TABLENAME, parentContent, port)
+    
+    # occurrences so far, and ops on the file since the last one
+    (count, settled, offset, rest) = (0, 0, 0, "")
+    def observe():
+        nonlocal count, settled, offset, rest
+        (chunk, offset) = tailLog(captureID, "lazyfs", offset)
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        for line in lines:
+            ops = extractFiles([line]).get(file, {})
+            if operation in ops:
+                (count, settled) = (count + 1, 0)
+            elif len(ops) > 0 and not "getattr" in ops:
+                settled += 1
+    
+    await asyncio.to_thread(observe)
+    passed = [h for h in remaining if h <= count]
+    remaining = [h for h in remaining if h > count]
+    
+    progress = {}
+    unpaused = True
+    workload = asyncio.create_task(asyncio.to_thread(runWorkload, port, captureID, seed, True, dbContent=parentContent, progress=progress))
+    captures = []
+    
+    while len(remaining) > 0 and not workload.done():
+        await asyncio.to_thread(observe)
+        missed = [h for h in remaining if h < count]
+        if len(missed) > 0:
+            debug("workload ran past hurdles", missed, "before the pause, running them separately", level=2)
+            passed += missed
+            remaining = [h for h in remaining if h >= count]
+            continue
+        if count < remaining[0] or settled == 0:
+            await asyncio.sleep(0.005)
+            continue
+        if not await pauseContainer(captureID):
+            break
+        # the commits are counted in this prefix of the log later, see capturedState
+        logLength = len(progress.get("log", []))
+        await asyncio.to_thread(observe)
+        if count == remaining[0]:
+            hurdle = remaining.pop(0)
+            snapshotID = await duplicateContainer(captureID)
+            await asyncio.to_thread(copyContainerLogs, captureID, snapshotID)
+            debug("captured", snapshotID, "at hurdle", hurdle, level=2)
+            captures.append((numbers[hurdle], hurdle, snapshotID, logLength))
+        if not await unpauseContainer(captureID):
+            info("capture container didn't unpause, running", len(remaining), "hurdles separately")
+            # the workload only returns once its connections to the paused SUT break
+            await removeContainer(captureID)
+            unpaused = False
+            break
+    
+    (content, metadata, log) = await workload
+    await cleanupContainer(captureID)
+    
+    if not metadata["successful"] and unpaused:
+        error("capture run failed, seed", seed, metadata.get("details", ""))
+    
+    for (number, occurrence, snapshotID, logLength) in captures:
+        captured = capturedState(snapshotID, occurrence, logLength, content, metadata, log)
+        enqueue(seed, runHurdle, (group, number, occurrence, captured), group["priority"])
+    
+    enqueueSeparately(group, numbers, passed + remaining)
+
+def capturedState(snapshotID, occurrence, logLength, content, metadata, log):
+    """reconstructs what runWorkload would have returned had the container crashed where it was captured"""
+    snapshots = metadata["oldSnapshots"]
+    trace = copy.deepcopy(log[:logLength])
+    # runWorkload records a commit in its snapshots before logging its success, so commits with a result in the
+    # prefix are exactly the ones acknowledged at the pause, unlike the snapshots read at some other moment
+    commits = sum(1 for (i, item) in enumerate(trace[:-1]) if item.get("type") == "commit" and trace[i + 1].get("result") == "success")
+    state = {k: v for (k, v) in metadata.items() if not k in ["oldSnapshots", "altContent", "initialLog"]}
+    state.update({
+        "successful": False,
+        "result": "error",
+        "details": f"crash state captured after occurrence {occurrence}",
+        "oldSnapshots": snapshots.truncated(commits),
+        "initialLog": []
+    })
+    if len(trace) % 2 == 1 and trace[-1].get("type") == "commit" and commits + 1 <= len(snapshots):
+        state["altContent"] = list(snapshots.after(commits + 1))
+    return {"id": snapshotID, "content": list(snapshots.after(min(commits, len(snapshots)))), "metadata": state, "log": trace}
 
 def getHurdles(files, nextDepth, steps):
     newFile = shared.FILE[nextDepth] if len(shared.FILE) > nextDepth else shared.FILE[-1]
@@ -471,46 +1177,240 @@ def getHurdles(files, nextDepth, steps):
 
     stepSize = max(int(maxOps / steps), 1)
 
-    hurdles = [(i+1) * stepSize for i in range(steps)]
+    # hurdles past the last occurrence would never crash
+    hurdles = [(i+1) * stepSize for i in range(min(steps, maxOps))]
     
     return hurdles
 
+###########
+# JOURNAL #
+###########
+
+# Admitted seeds, enqueued levels of hurdles, bisections, finished iterations and finished seeds are
+# appended to logs/<sut>/<run>/journal.jsonl as they happen, and the persisted data of every template is
+# archived next to it, as the container root may not survive a reboot. --resume rebuilds the queue from both.
+# Events are written in order by a single writer task off the event loop, so a termination loses at most
+# the latest ones, as if it had happened a little earlier. Every event records the seconds the run has been
+# working so far, which --resume subtracts from the budget.
+
+# journal lines not written yet
+journalBuffer = []
+journalWriter = None
+
+def journalPath():
+    return f"logs/{shared.SUT}/{shared.TEST_RUN}/journal.jsonl"
+
+def journal(event):
+    global journalWriter
+    if not shared.JOURNAL:
+        return
+    # the seconds run so far, for the budget of a resumed run
+    journalBuffer.append(json.dumps(dict(event, elapsed=round(elapsed(), 1))) + "\n")
+    if journalWriter is None or journalWriter.done():
+        journalWriter = asyncio.create_task(writeJournal())
+
+async def writeJournal():
+    # everything buffered while the previous batch was written goes out with a single fsync
+    while len(journalBuffer) > 0:
+        lines = journalBuffer[:]
+        journalBuffer.clear()
+        try:
+            await asyncio.to_thread(appendJournal, lines)
+        except OSError as e:
+            error("writing", len(lines), "journal events failed:", e)
+
+def appendJournal(lines):
+    with open(journalPath(), "a") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def elapsed():
+    return resumedElapsed + time.monotonic() - started
+
+async def flushJournal():
+    if journalWriter is not None:
+        await journalWriter
+
+def archiveTemplate(templateID):
+    target = f"logs/{shared.SUT}/{shared.TEST_RUN}/templates/{templateID}"
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    r = subprocess.run(["cp", "-r", "--reflink=auto", f"SUT/{shared.SUT}/container/container-{templateID}/persisted", target + ".partial"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if r.returncode != 0:
+        error("archiving template", templateID, "failed with code", r.returncode)
+        error(r.stderr.decode())
+        return
+    # only complete archives are restored
+    os.rename(target + ".partial", target)
+
+def restoreTemplate(templateID):
+    """recreates the environment of a template from its archive unless it is still there, returns whether that worked"""
+    directory = f"SUT/{shared.SUT}/container/container-{templateID}"
+    archive = f"logs/{shared.SUT}/{shared.TEST_RUN}/templates/{templateID}"
+    if os.path.exists(f"{directory}/persisted"):
+        return True
+    if not os.path.exists(archive):
+        return False
+    debug("restoring template", templateID, "from its archive", level=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    os.mkfifo(f"{directory}/faults.fifo")
+    for name in ["lazyfs", shared.SUT]:
+        open(f"{directory}/{name}.log", "w").close()
+    r = subprocess.run(["cp", "-r", "--reflink=auto", archive, f"{directory}/persisted"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return r.returncode == 0
+
+def readJournal():
+    """replays the journal of the run to resume, returns seed -> its state for every seed admitted so far
+    
+    A level of hurdles is only kept if the iteration it was enqueued by finished, as the iteration is run
+    again otherwise. Each seed's "templates" are those its kept levels need, none once it is finished.
+    """
+    global resumedElapsed
+    if not os.path.exists(journalPath()):
+        error("No journal found for run", shared.TEST_RUN, kill=True)
+    state = {}
+    length = 0
+    with open(journalPath(), "rb") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            length += len(line)
+            resumedElapsed = max(resumedElapsed, event.get("elapsed", 0))
+            seed = event["seed"]
+            if event["event"] == "seed":
+                state[seed] = {"batch": event["batch"], "finished": False, "levels": {}}
+            elif event["event"] == "level":
+                state[seed]["levels"][event["prefix"]] = dict(event, bisected={}, done={})
+            elif event["event"] == "bisect":
+                state[seed]["levels"][event["prefix"]]["bisected"][event["number"]] = event["hurdle"]
+            elif event["event"] == "hurdle":
+                state[seed]["levels"][event["prefix"]]["done"][event["number"]] = event
+            elif event["event"] == "finished":
+                state[seed]["finished"] = True
+    # a write torn by the termination is cut off, new events are appended behind the last complete one
+    with open(journalPath(), "r+b") as f:
+        f.truncate(length)
+    
+    for seedState in state.values():
+        kept = {}
+        for prefix in sorted(seedState["levels"], key=lambda prefix: prefix.count(".")):
+            number = prefix[:-1]
+            parentPrefix = number[:number.rfind(".") + 1]
+            if prefix == "" or (parentPrefix in kept and number in kept[parentPrefix]["done"]):
+                kept[prefix] = seedState["levels"][prefix]
+        seedState["levels"] = kept
+        seedState["templates"] = [] if seedState["finished"] else [level["templateID"] for level in kept.values()]
+    return state
+
+async def resumeSeeds(state, makeLog):
+    """re-enqueues the iterations of the journaled seeds that did not finish, with their results so far"""
+    needed = [id for seedState in state.values() for id in seedState["templates"]]
+    if os.path.isdir(f"logs/{shared.SUT}/{shared.TEST_RUN}/templates"):
+        for entry in os.listdir(f"logs/{shared.SUT}/{shared.TEST_RUN}/templates"):
+            if not entry in needed:
+                shutil.rmtree(f"logs/{shared.SUT}/{shared.TEST_RUN}/templates/{entry}", ignore_errors=True)
+    
+    unfinished = [seed for seed in state if not state[seed]["finished"]]
+    info("Resuming run", shared.TEST_RUN + ",", len(state) - len(unfinished), "seeds finished,", len(unfinished), "to continue")
+    
+    for seed in unfinished:
+        seedState = state[seed]
+        admit(seed)
+        if len(seedState["levels"]) == 0:
+            # interrupted before its first level of hurdles was enqueued
+            debug("restarting seed", seed, level=1)
+            enqueue(seed, runSeed, (seedState["batch"], seed, makeLog), 0 if deadline is None else SEED_PRIORITY)
+            continue
+        startedSeeds.add(seed)
+        
+        for level in seedState["levels"].values():
+            for done in level["done"].values():
+                results[seed].update(done["results"])
+                parents[seed].update(done["parents"])
+        
+        for level in seedState["levels"].values():
+            templates[seed].append(level["templateID"])
+            remaining = {number: hurdle for (number, hurdle) in (level["hurdles"] | level["bisected"]).items() if not number in level["done"]}
+            if len(remaining) == 0:
+                continue
+            if not await asyncio.to_thread(restoreTemplate, level["templateID"]):
+                error("template", level["templateID"], "of seed", seed, "is lost, dropping", len(remaining), "of its iterations")
+                continue
+            group = {
+                "seed": seed,
+                "parentID": level["parentID"],
+                "templateID": level["templateID"],
+                "content": [tuple(row) for row in level["content"]],
+                "batch": level["batch"],
+                "prefix": level["prefix"],
+                "makeLog": level["makeLog"],
+                "remainingDepth": level["remainingDepth"],
+                "steps": level["steps"],
+                "priority": level["priority"],
+                "outcomes": {done["hurdle"]: next((r["result"] for r in done["results"].values()), None) for done in level["done"].values()},
+                "scheduled": set(level["hurdles"].values()) | set(level["bisected"].values()) | {done["hurdle"] for done in level["done"].values()},
+                "next": max(int(number.split(".")[-1]) for number in level["hurdles"] | level["bisected"]) + 1
+            }
+            debug("resuming", len(remaining), "iterations of seed", seed, "at level", repr(level["prefix"]), level=1)
+            warmUp(group["templateID"], len(remaining))
+            for (number, hurdle) in remaining.items():
+                enqueue(seed, runHurdle, (group, number, hurdle), group["priority"])
+        
+        if pending[seed] == 0:
+            # every iteration finished, the results were just not written
+            del pending[seed]
+            await admitted(seed)
+            await finishSeed(seed)
+        else:
+            await admitted(seed)
+
 #####################
 # SEED VERIFICATION #
 #####################
 
-def verifySeedThreaded(batch, threadNumber, seed, results, makeLog):
-    tls.number = f"{(threadNumber + 1):02d}"
-    tls.batch = str(batch + 1)
+async def verifySeedInBatch(batch, threadNumber, seed, results, makeLog):
+    setThreadId(str(batch + 1), f"{(threadNumber + 1):02d}")
     debug("verifying seed", seed, level=1)
     try:
-        if verifySeed(seed, makeLog):
+        if await verifySeed(seed, makeLog):
             results[threadNumber] = True
             debug("Success", level=1)
         else:
             error("Failure reported, seed", seed)
-    except Exception as e:
+    except (Exception, SystemExit) as e:
         error(type(e), "exception occurred, seed", seed, traceback.format_exc())
 
-def verifySeed(seed, makeLog):
-    containerID = prepHostEnvironment()
-    port = runContainer(containerID)
-    waitUntilAvailable(containerID, port, timeout=90, kill=True)
-    create(test_db["name"], schema=test_db["schema"], port=port)
-    (content, metadata, log) = runWorkload(port, containerID, seed, makeLog=(makeLog in ["all", "failed"]), verification=True)
+async def verifySeed(seed, makeLog):
+    containerID = await prepHostEnvironment()
+    port = await runContainer(containerID)
+    await waitUntilAvailable(containerID, port, timeout=90, kill=True)
+    await asyncio.to_thread(create, test_db["name"], schema=test_db["schema"], port=port)
+    (content, metadata, log) = await asyncio.to_thread(runWorkload, port, containerID, seed, makeLog=(makeLog in ["all", "failed"]), verification=True)
     if makeLog == "all" or (makeLog == "failed" and not metadata["successful"]):
-        mergeLogs(metadata, log, containerID)
-        logAll(seed, containerID, metadata, log)
-        export.collectAndExport(f"logs/{shared.SUT}/trial/{seed}/raw/{containerID}.json")
-        copyVisualization(seed, containerID, metadata["result"] if "result" in metadata else "successful", containerID)
+        await asyncio.to_thread(mergeLogs, metadata, log, containerID)
+        await asyncio.to_thread(logAll, seed, containerID, metadata, log)
+        await asyncio.to_thread(export.collectAndExport, f"logs/{shared.SUT}/trial/{seed}/raw/{containerID}.json")
+        await asyncio.to_thread(copyVisualization, seed, containerID, metadata["result"] if "result" in metadata else "successful", containerID)
         info("trace hash:", traceHash(log))
-    cleanupContainer(containerID)
+    await cleanupContainer(containerID)
     debug("seed was", seed, level=1)
     return metadata["successful"]
 
-def verifySeedsThreaded(makeLog, seeds):
+def verifySeeds(makeLog, seeds):
+    asyncio.run(verifyBatches(makeLog, seeds))
+
+async def verifyBatches(makeLog, seeds):
 
     buildSUTImage()
+    
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=shared.CONCURRENT_TESTS + 4))
 
     for (i, b) in enumerate(itertools.batched(seeds, shared.CONCURRENT_TESTS)):
         if os.path.exists(".terminate"):
@@ -521,13 +1421,8 @@ def verifySeedsThreaded(makeLog, seeds):
 
         info("seeds", b[0], "through", b[-1])
 
-        threads = [Thread(target=verifySeedThreaded, args=(i, t, s, results, makeLog)) for (t, s) in enumerate(b)]
-        for (n, t) in enumerate(threads):
-            debug("starting thread", n + 1, level=2)
-            t.start()
-        for (n, t) in enumerate(threads):
-            debug("joining thread", n + 1, level=2)
-            t.join()
+        debug("starting", len(b), "tests", level=2)
+        await asyncio.gather(*[verifySeedInBatch(i, t, s, results, makeLog) for (t, s) in enumerate(b)])
         debug("finished test batch", i + 1, level=1)
 
         if not False in results:
@@ -536,20 +1431,20 @@ def verifySeedsThreaded(makeLog, seeds):
             error("Errors in tests", [n for (n, s) in enumerate(results) if not s], "with seeds", [b[i] for (i, s) in enumerate(results) if not s])
             failed = [b[i] for (i, s) in enumerate(results) if not s]
             for seed in failed.copy():
-                id = prepHostEnvironment()
-                port = runContainer(id)
-                if not waitUntilAvailable(id, port, timeout=90):
+                id = await prepHostEnvironment()
+                port = await runContainer(id)
+                if not await waitUntilAvailable(id, port, timeout=90):
                     error("container didn't start on retry, seed", seed)
                     continue
                 else:
-                    create(shared.DB_TABLENAME, test_db["schema"], port)
-                    (content, metadata, log) = runWorkload(port, id, seed, makeLog=True, verification=True)
+                    await asyncio.to_thread(create, shared.DB_TABLENAME, test_db["schema"], port)
+                    (content, metadata, log) = await asyncio.to_thread(runWorkload, port, id, seed, makeLog=True, verification=True)
                     if metadata["successful"]:
                         debug("seed", seed, "completed successfully in second try", level=1)
                         failed.remove(seed)
                         continue
-                mergeLogs(metadata, log, id)
-                logAll(seed, id, metadata, log)
+                await asyncio.to_thread(mergeLogs, metadata, log, id)
+                await asyncio.to_thread(logAll, seed, id, metadata, log)
                 
             if len(failed) == 0:
                 debug("All tests succeeded on second try", level=1)
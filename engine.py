@@ -0,0 +1,192 @@
+import http.client
+import json
+import os
+import shared
+import socket
+import threading
+import time
+import urllib.parse
+
+# Talks to the Docker Engine HTTP API over its unix socket instead of forking the docker CLI.
+# Every call mirrors one of the SUT scripts and returns (code, stdout, stderr) like utils.runScript,
+# SUTs without an entry in CONTAINERS keep using their scripts.
+
+###########################
+# CONTAINER CONFIGURATION #
+###########################
+
+# what SUT/<sut>/scripts/run-container.sh, stop-sut.sh and stop-container.sh encode per SUT
+# memory:       --memory in GiB
+# log:          mount point of <sut>.log inside the container (default /tmp/<sut>.log)
+# stop:         script stopping only the SUT (default /stop-<sut>.sh)
+# restart:      script stopping or starting the SUT in place, if restart-sut.sh exists (default /restart-<sut>.sh)
+# truncateLog:  empty <sut>.log before starting
+# env:          additional environment variables
+CONTAINERS = {
+    "umbra": {"memory": 1},
+    "umbra-assert": {"memory": 1.5, "log": "/tmp/umbra.log", "stop": "/stop-umbra.sh"},
+    "postgres": {"memory": 1.5, "truncateLog": True, "env": {"POSTGRES_INITDB_ARGS": "--auth=trust", "POSTGRES_HOST_AUTH_METHOD": "trust"}},
+    "cedardb": {"memory": 3},
+    "duckdb": {"memory": 1},
+    "duckdb-assert": {"memory": 1},
+    "sqlite": {"memory": 1},
+}
+
+# label carrying the ID of the run a container belongs to, see utils.reapOrphans
+RUN_LABEL = "ctf.run"
+
+def available():
+    if shared.CONTAINER_BACKEND == "scripts" or not shared.SUT in CONTAINERS:
+        return False
+    if shared.CONTAINER_BACKEND == "api":
+        return True
+    return os.path.exists(socketPath())
+
+def socketPath():
+    host = os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
+    return host[len("unix://"):] if host.startswith("unix://") else "/var/run/docker.sock"
+
+def containerName(containerID):
+    return f"lazy{shared.SUT}-{containerID}"
+
+def containerDirectory(containerID):
+    # the daemon resolves bind mounts itself, so hand it the real path behind SUT/<sut>/container
+    return os.path.realpath(os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "container", "container-" + containerID]))
+
+#####################
+# CONTAINER CONTROL #
+#####################
+
+def runContainer(containerID, port, crashcmd):
+    config = CONTAINERS[shared.SUT]
+    directory = containerDirectory(containerID)
+    if config.get("truncateLog", False):
+        # prevents premature return of waitUntilAvailable
+        open(os.sep.join([directory, shared.SUT + ".log"]), "w").close()
+    spec = {
+        "Image": f"lazy{shared.SUT}",
+        "Labels": {RUN_LABEL: shared.TEST_RUN},
+        "Tty": True,
+        "OpenStdin": True,
+        "Env": [f"CRASHCMD={crashcmd}"] + [f"{k}={v}" for (k, v) in config.get("env", {}).items()],
+        "ExposedPorts": {"5432/tcp": {}},
+        "HostConfig": {
+            "Ulimits": [{"Name": "nofile", "Soft": 1048576, "Hard": 1048576}, {"Name": "memlock", "Soft": 8388608, "Hard": 8388608}],
+            "Memory": int(config["memory"] * 1024 ** 3),
+            "ShmSize": 500 * 1024 ** 2,
+            "Devices": [{"PathOnHost": "/dev/fuse", "PathInContainer": "/dev/fuse", "CgroupPermissions": "rwm"}],
+            "CapAdd": ["SYS_ADMIN"],
+            "SecurityOpt": ["apparmor:unconfined"],
+            "PortBindings": {"5432/tcp": [{"HostPort": str(port) if port != 0 else ""}]},
+            "Binds": [
+                f"{directory}/persisted:/tmp/lazyfs.root",
+                f"{directory}/faults.fifo:/tmp/faults.fifo",
+                f"{directory}/lazyfs.log:/tmp/lazyfs.log",
+                f"{directory}/{shared.SUT}.log:{config.get('log', f'/tmp/{shared.SUT}.log')}",
+            ],
+        },
+    }
+    name = containerName(containerID)
+    (status, data) = request("POST", "/containers/create?" + urllib.parse.urlencode({"name": name}), spec)
+    if status != 201:
+        return (1, b"", data)
+    (status, data) = request("POST", f"/containers/{name}/start")
+    if not status in [204, 304]:
+        return (1, b"", data)
+    return (0, name.encode(), b"")
+
+def stopSUT(containerID):
+    return execute(containerName(containerID), ["sh", CONTAINERS[shared.SUT].get("stop", f"/stop-{shared.SUT}.sh")])
+
+def restartSUT(containerID, phase):
+    return execute(containerName(containerID), ["sh", CONTAINERS[shared.SUT].get("restart", f"/restart-{shared.SUT}.sh"), phase])
+
+def stopContainer(containerID):
+    name = containerName(containerID)
+    (_, output, _) = execute(name, ["sh", "/stop-all.sh"])
+    (status, data) = request("POST", f"/containers/{name}/stop")
+    if not status in [204, 304]:
+        output += data
+    (status, data) = request("DELETE", f"/containers/{name}")
+    return (0 if status == 204 else 1, output, b"" if status == 204 else data)
+
+def pauseContainer(containerID):
+    (status, data) = request("POST", f"/containers/{containerName(containerID)}/pause")
+    return (0 if status == 204 else 1, b"", b"" if status == 204 else data)
+
+def unpauseContainer(containerID):
+    (status, data) = request("POST", f"/containers/{containerName(containerID)}/unpause")
+    return (0 if status == 204 else 1, b"", b"" if status == 204 else data)
+
+# how often and how long to wait between checks whether an exec has exited after its output ended
+EXEC_POLLS = 100
+EXEC_POLL_INTERVAL = 0.01
+
+def execute(name, cmd):
+    (status, data) = request("POST", f"/containers/{name}/exec", {"Cmd": cmd, "Tty": True, "AttachStdout": True, "AttachStderr": True})
+    if status != 201:
+        return (1, b"", data)
+    execID = json.loads(data)["Id"]
+    # not detached, the response streams the output until the command exits
+    (status, output) = request("POST", f"/exec/{execID}/start", {"Detach": False, "Tty": True})
+    if status != 200:
+        return (1, b"", output)
+    # the stream can end before the daemon has recorded the exit code
+    for attempt in range(EXEC_POLLS):
+        (status, data) = request("GET", f"/exec/{execID}/json")
+        if status != 200:
+            return (1, output, data)
+        inspection = json.loads(data)
+        if not inspection["Running"]:
+            break
+        time.sleep(EXEC_POLL_INTERVAL)
+    if inspection["Running"] or inspection["ExitCode"] is None:
+        return (1, output, f"exec {execID} in {name} has no exit code".encode())
+    return (inspection["ExitCode"], output, b"")
+
+###################
+# CONNECTION POOL #
+###################
+
+class unixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+MAX_IDLE = 32
+idle = []
+poolLock = threading.Lock()
+
+def request(method, path, body=None):
+    with poolLock:
+        conn = idle.pop() if idle else None
+    if conn is not None:
+        try:
+            return send(conn, method, path, body)
+        except (OSError, http.client.HTTPException):
+            # the daemon closed the idle connection in the meantime
+            pass
+    return send(unixConnection(socketPath()), method, path, body)
+
+def send(conn, method, path, body):
+    try:
+        conn.request(method, path, body=None if body is None else json.dumps(body), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        data = response.read()
+    except:
+        conn.close()
+        raise
+    if response.will_close:
+        conn.close()
+    else:
+        with poolLock:
+            if len(idle) < MAX_IDLE:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+    return (response.status, data)
@@ -25,7 +25,16 @@ def main():
     p.add_argument("-f", "--from", help="Starting seed for the transaction traces (inclusive)", type=int)
     p.add_argument("-u", "--until", help="End seed for the transaction traces (exclusive, default 10_000)", type=int)
     
+    p.add_argument("--shard", metavar="I/N", help="Runs only the I-th of N parts of the seeds (1-based), partitioned by their cost in earlier runs found in logs/SUT.\nCombine the runs of all parts with merge.py. Only one part per SUT can run on a host at a time.")
     p.add_argument("-c", "--concurrent", help=f"Number of concurrent tests to run (default {shared.CONCURRENT_TESTS})", type=int)
+    p.add_argument("--budget", metavar="DURATION", help="Time budget for the campaign, e.g. 8h, 90m or 3600s. Runs the seeds in order until the budget is exhausted,\npreferring shallow, novel and unexplored work over deeper recursion below correct content.\nQueued work is dropped once the budget is exhausted, completed work is still written and exported.")
+    p.add_argument("--adaptive", action="store_const", const=True, default=None, help="If specified, adapts the number of concurrent tests to free memory, container root space, load and container start latency,\nusing -c [--concurrent] as the upper bound")
+    p.add_argument("--warm-pool", help=f"Number of container environments per template to keep prepared in the background (default {shared.WARM_POOL}, disabled)", type=int)
+    p.add_argument("--container-root", help=f"Host directory for the container environments (default {shared.CONTAINER_ROOT}).\nOn a file system with reflinks (btrfs, xfs, ...), duplicating containers is copy-on-write.")
+    p.add_argument("--container-backend", choices=["auto", "api", "scripts"], help=f"How containers are run and stopped (default {shared.CONTAINER_BACKEND})\n-> api:\t\tDocker Engine API over its unix socket\n-> scripts:\tthe SUT's bash scripts\n-> auto:\tapi if the socket exists and the SUT is known, scripts otherwise")
+    p.add_argument("--image-cache", help=f"Number of built SUT images to keep cached along with the template with the empty test table prepared on them,\nleast recently used ones are evicted (default {shared.IMAGE_CACHE}, 0 always rebuilds)", type=int)
+    p.add_argument("--clear-image-cache", action="store_const", const=True, default=None, help="If specified, will remove all cached images of the SUT before building")
+    p.add_argument("--port-range", metavar="FIRST-LAST", help=f"Host ports handed out to the containers (default {shared.PORT_RANGE[0]}-{shared.PORT_RANGE[1]})")
     p.add_argument("-l", "--log", choices=["none", "retry", "failed", "all"], help="If specified, will generate a log for the respective transaction trace\n-> none:\tdon't log anything\n-> retry:\tretry failed traces with logging\n-> failed:\tlog everything, discard logs for successful traces\n-> all:\t\tlog all")
     
     p.add_argument("--verify", action="store_const", const=True, default=None, help="If specified, will verify the seed(s), running without injected hardware faults")
@@ -37,6 +46,13 @@ def main():
     p.add_argument("-s", "--steps", help="The amount of different hurdles to crash LazyFS at", type=int)
     p.add_argument("-d", "--recursion-depth", help="The maximum recursion depth of crash/restart/verify", type=int)
     p.add_argument("-q", "--recursion-factor", help="Steps is multiplied by this value at each recursion level, allowing for wider or narrower branching", type=float)
+    p.add_argument("--capture", action="store_const", const=True, default=None, help="If specified, runs the workload once per recursion level and captures the crash state at every hurdle,\ninstead of running it once per hurdle. Only applies to the timing \"after\".")
+    p.add_argument("--bisect", action="store_const", const=True, default=None, help="If specified, bisects between neighbouring hurdles with different outcomes until the boundary occurrence is found")
+    p.add_argument("--dedup", action="store_const", const=True, default=None, help="If specified, crash states identical on disk and in their expected content are verified only once,\nlater ones reuse the outcome and are marked as deduplicated")
+    p.add_argument("--coverage", action="store_const", const=True, default=None, help="If specified, explores the crash states of seeds whose runs show lazyfs op sequences or SUT log lines not seen before first,\nand those of seeds that show none last")
+    p.add_argument("--restart-in-place", action="store_const", const=True, default=None, help="If specified, verifies a crash state by restarting only the SUT and lazyfs inside the crashed container,\ninstead of starting a new container on a copy of it. Requires SUT/SUT/scripts/restart-sut.sh.")
+    p.add_argument("--journal", action="store_const", const=True, default=None, help="If specified, journals the campaign and archives the persisted data of its templates in logs/SUT/RUN,\nwhich --resume relies on")
+    p.add_argument("--plan-cache", help=f"Number of compiled workload plans to keep cached in plans/ across runs, least recently used ones are evicted\n(default {shared.PLAN_CACHE}, 0 compiles them again in every run)", type=int)
     p.add_argument("-k", "--checkpoint", help="If set to true, will checkpoint LazyFS after every finished transaction", action="store_const", const=True, default=None)
     
     p.add_argument("--num-transactions", type=int)
@@ -52,9 +68,18 @@ def main():
     p.add_argument("--p-serialization-failure", type=float)
     
     p.add_argument("-x", "--config", metavar="FILE.json", help="Config file that holds parameters.\nCan be overridden by cmd line args.")
+    p.add_argument("--resume", metavar="logs/SUT/RUN", help="Continues a terminated run from its journal with the configuration it was started with, skipping finished iterations.\nRefuses to start while a run of the SUT is still alive, orphaned containers of the run are removed.")
     
     n = p.parse_args()
     
+    if n.resume is not None:
+        if os.path.isfile(os.path.join(n.resume, "configuration.json")):
+            with open(os.path.join(n.resume, "configuration.json")) as f:
+                data = json.load(f)
+            setConfigFileValues(n, data)
+        else:
+            utils.error("No run to resume in", n.resume, kill=True)
+    
     if n.config is not None:
         if os.path.exists(n.config) and os.path.isfile(n.config):
             with open(n.config) as f:
@@ -79,6 +104,9 @@ def main():
     
     setSharedValues(n)
     
+    if n.clear_image_cache:
+        utils.clearImageCache()
+    
     assert shared.NUM_TRANSACTIONS > 0
     assert shared.P_COMMIT <= 1 and shared.P_COMMIT > 0
     assert shared.P_INSERT >= 0
@@ -86,14 +114,23 @@ def main():
     assert (shared.P_INSERT + shared.P_UPDATE) <= 1
     assert shared.P_SERIALIZATION_FAILURE < 1 and shared.P_SERIALIZATION_FAILURE >= 0
     
+    # a resumed run already holds the seeds of its shard
+    if shared.SHARD is not None and n.resume is None:
+        if n.seed is None and getattr(n, "from") is not None:
+            n.seed = [i for i in range(getattr(n, "from"), n.until)]
+        if n.seed is not None:
+            n.seed = benchmark.shardSeeds(n.seed)
+            if len(n.seed) == 0:
+                utils.error("No seeds in shard", n.shard, kill=True)
+    
     if n.seed != None:
         print(n)
         if n.verify:
             utils.info(f"Verifying seed{'s' if len(n.seed) > 1 else ''}", *n.seed)
-            benchmark.verifySeedsThreaded(n.log, seeds=n.seed)
+            benchmark.verifySeeds(n.log, seeds=n.seed)
         else:
             utils.info(f"Running seed{'s' if len(n.seed) > 1 else ''}", *n.seed)
-            benchmark.runSeeds(n.log, seeds=n.seed)
+            benchmark.runSeeds(n.log, seeds=n.seed, resume=None if n.resume is None else os.path.basename(os.path.normpath(n.resume)))
     elif getattr(n, "from") != None:
         print(n)
         if getattr(n, "from") >= n.until:
@@ -101,7 +138,7 @@ def main():
             utils.error("end of seed range must be at least 1 above start", kill=True)
         if n.verify:
             utils.info("Verifying seeds", getattr(n, "from"), "through", n.until - 1)
-            benchmark.verifySeedsThreaded(n.log, [i for i in range(getattr(n, "from"), n.until)])
+            benchmark.verifySeeds(n.log, [i for i in range(getattr(n, "from"), n.until)])
         else:
             utils.info("Running seeds", getattr(n, "from"), "through", n.until - 1)
             benchmark.runSeeds(n.log, [i for i in range(getattr(n, "from"), n.until)])
@@ -113,6 +150,14 @@ def main():
             
     utils.info("All done.")
 
+def parseDuration(text):
+    """seconds in a duration like 8h, 90m, 3600s or 3600"""
+    text = str(text).strip()
+    units = {"h": 3600, "m": 60, "s": 1}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
 def setConfigFileValues(n, data):
     for key in data:
         if getattr(n, key) == None:
@@ -127,6 +172,23 @@ def setSharedValues(n):
         shared.DEBUG_LEVEL = n.verbose
     if n.concurrent is not None:
         shared.CONCURRENT_TESTS = n.concurrent
+    if n.budget is not None:
+        shared.BUDGET = parseDuration(n.budget)
+    if n.adaptive is not None:
+        shared.ADAPTIVE_CONCURRENCY = n.adaptive
+    if n.warm_pool is not None:
+        shared.WARM_POOL = n.warm_pool
+    if n.container_root is not None:
+        shared.CONTAINER_ROOT = os.path.abspath(n.container_root)
+    if n.container_backend is not None:
+        shared.CONTAINER_BACKEND = n.container_backend
+    if n.image_cache is not None:
+        shared.IMAGE_CACHE = n.image_cache
+    if n.port_range is not None:
+        shared.PORT_RANGE = tuple(int(p) for p in n.port_range.split("-"))
+    if n.shard is not None:
+        shared.SHARD = tuple(int(i) for i in n.shard.split("/"))
+        assert shared.SHARD[0] >= 1 and shared.SHARD[0] <= shared.SHARD[1]
     
     if n.walfile is not None:
         shared.FILE = n.walfile
@@ -142,6 +204,20 @@ def setSharedValues(n):
         shared.RECURSION_FACTOR = n.recursion_factor
     if n.checkpoint is not None:
         shared.CHECKPOINT = n.checkpoint
+    if n.capture is not None:
+        shared.CAPTURE = n.capture
+    if n.bisect is not None:
+        shared.BISECT = n.bisect
+    if n.dedup is not None:
+        shared.DEDUPLICATE = n.dedup
+    if n.coverage is not None:
+        shared.COVERAGE = n.coverage
+    if n.restart_in_place is not None:
+        shared.RESTART_IN_PLACE = n.restart_in_place
+    if n.journal is not None:
+        shared.JOURNAL = n.journal
+    if n.plan_cache is not None:
+        shared.PLAN_CACHE = n.plan_cache
     
     if n.num_transactions is not None:
         shared.NUM_TRANSACTIONS = n.num_transactions
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+import json
+import os
+import re
+import shared
+import shutil
+import sys
+import utils
+
+# Combines the runs of a campaign split with --shard, or any other runs of the same SUT, into a single run
+# logs/<sut>/merged-<timestamp>, with all seeds, a summary.json and the visualizations of all seeds by result.
+
+# configuration keys that may differ between the runs of one campaign
+HOST_SETTINGS = ["seed", "shard", "container_root", "container_backend", "port_range", "image_cache"]
+
+def main():
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} ./logs/sut/run1 ./logs/sut/run2 ...")
+        exit(1)
+
+    shared.DEBUG_LEVEL = 2
+    merge([os.path.normpath(path) for path in sys.argv[1:]])
+    utils.info("done.")
+
+def merge(runs):
+    configurations = []
+    for run in runs:
+        if not os.path.isfile(os.path.join(run, "configuration.json")):
+            utils.error(f"Invalid run: {run}", kill=True)
+        with open(os.path.join(run, "configuration.json")) as f:
+            configurations.append(json.load(f))
+
+    for (run, configuration) in zip(runs[1:], configurations[1:]):
+        differing = [key for key in set(configuration) | set(configurations[0]) if not key in HOST_SETTINGS and configuration.get(key) != configurations[0].get(key)]
+        if len(differing) > 0:
+            utils.error(f"Configuration of {run} differs from {runs[0]} in", *sorted(differing))
+
+    target = f"logs/{configurations[0]['sut']}/merged-{utils.getFormattedTimestamp()}"
+    os.makedirs(target)
+
+    # seed -> (run holding its results, whether it finished there)
+    sources = {}
+    duplicates = set()
+    campaign = set()
+    for (run, configuration) in zip(runs, configurations):
+        campaign.update(configuration["seed"])
+        if os.path.isfile(os.path.join(run, "shard.json")):
+            with open(os.path.join(run, "shard.json")) as f:
+                campaign.update(json.load(f)["campaign"])
+        for entry in sorted(os.listdir(run)):
+            if not re.fullmatch(r"-?\d+", entry) or not os.path.isdir(os.path.join(run, entry)):
+                continue
+            seed = int(entry)
+            finished = os.path.isfile(os.path.join(run, entry, "testResult.json"))
+            if seed in sources:
+                duplicates.add(seed)
+                if sources[seed][1] or not finished:
+                    continue
+            sources[seed] = (run, finished)
+
+    summary = {"runs": runs, "results": {}, "seeds": {}}
+    for seed in sorted(sources):
+        (run, finished) = sources[seed]
+        utils.debug("merging seed", seed, "from", run, level=1)
+        shutil.copytree(os.path.join(run, str(seed)), os.path.join(target, str(seed)))
+        summary["seeds"][seed] = {"run": run, "finished": finished, "results": {}}
+        if finished:
+            with open(os.path.join(target, str(seed), "testResult.json")) as f:
+                for r in json.load(f)["results"].values():
+                    summary["seeds"][seed]["results"][r["result"]] = summary["seeds"][seed]["results"].get(r["result"], 0) + 1
+                    summary["results"][r["result"]] = summary["results"].get(r["result"], 0) + 1
+        collectVisualizations(target, seed)
+
+    summary["missing"] = sorted(campaign - set(sources))
+    summary["duplicates"] = sorted(duplicates)
+    summary["unfinished"] = sorted(seed for seed in sources if not sources[seed][1])
+
+    utils.dumpIntoFile(os.path.join(target, "configuration.json"), json.dumps(dict(configurations[0], seed=sorted(sources), shard=None), indent=2))
+    utils.dumpIntoFile(os.path.join(target, "summary.json"), json.dumps(summary, indent=4))
+
+    utils.info("Merged", len(sources), "seeds of", len(runs), "runs into", target)
+    for (key, text) in [("missing", "not run by any of the runs"), ("duplicates", "run more than once, kept the finished one"), ("unfinished", "not finished")]:
+        if len(summary[key]) > 0:
+            utils.error(len(summary[key]), "seeds", text + ":", *summary[key])
+
+def collectVisualizations(target, seed):
+    """copies the visualizations of a seed into the campaign's, sorted by result like the seed's own"""
+    source = os.path.join(target, str(seed), "visualization")
+    if not os.path.isdir(source):
+        return
+    for resType in os.listdir(source):
+        os.makedirs(os.path.join(target, "visualization", resType), exist_ok=True)
+        for item in os.listdir(os.path.join(source, resType)):
+            shutil.copyfile(os.path.join(source, resType, item), os.path.join(target, "visualization", resType, f"{seed}-{item}"))
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,15 @@ SYNC_METHODS = [
 SUT = "umbra"
 DEBUG_LEVEL = 0
 CONCURRENT_TESTS = 10
+ADAPTIVE_CONCURRENCY = False
+ADAPT_INTERVAL = 5
+BUDGET = 0
+WARM_POOL = 0
+CONTAINER_ROOT = "/dev/shm/ctf"
+PORT_RANGE = (20000, 32767)
+CONTAINER_BACKEND = "auto"
+IMAGE_CACHE = 3
+SHARD = None
 DB_TABLENAME = "lazytest"
 TEST_RUN = "trial"
 CHECKPOINT = False
@@ -24,6 +33,13 @@ TIMING = ["after"]
 STEPS = 20
 RECURSION_DEPTH = 2
 RECURSION_FACTOR = 1
+CAPTURE = False
+BISECT = False
+DEDUPLICATE = False
+COVERAGE = False
+JOURNAL = False
+PLAN_CACHE = 0
+RESTART_IN_PLACE = False
 
 ##########################
 # WORKFLOW SPECIFICATION #
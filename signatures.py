@@ -0,0 +1,31 @@
+import re
+
+# Cheap coverage signatures of a run: which lazyfs operations follow each other on which files, and
+# which kinds of lines the SUT logs. Numbers are masked, so only new behaviour counts as new coverage.
+
+# all features seen in this campaign
+seen = set()
+
+def lazyfsFeatures(lines):
+    """pairs of consecutive lazyfs operations, each as op:path"""
+    ops = []
+    for line in lines:
+        if not "[lazyfs.ops]" in line or not "lazyfs.root" in line or "lfs_getattr(" in line:
+            continue
+        path = line.split("lazyfs.root/")[1].split(",")[0].split(")")[0]
+        op = line.split("lfs_")[1].split("(path=")[0].split("(")[0]
+        ops.append(f"{op}:{mask(path)}")
+    return {("lazyfs", a, b) for (a, b) in zip(["start"] + ops, ops)}
+
+def logFeatures(lines, kind="log"):
+    """the distinct SUT log lines with timestamps, pids, sizes etc. masked"""
+    return {(kind, mask(line.strip())) for line in lines if line.strip() != ""}
+
+def mask(text):
+    return re.sub(r"0x[0-9a-fA-F]+|[0-9a-fA-F]*[0-9][0-9a-fA-F]*", "#", text)
+
+def novel(features):
+    """adds features to the coverage seen so far, returns how many of them are new"""
+    new = features - seen
+    seen.update(new)
+    return len(new)
@@ -1,5 +1,12 @@
+import array
+import asyncio
+import collections
+from contextvars import ContextVar
 import datetime
+import engine
+import fcntl
 from hashlib import md5
+import heapq
 import itertools
 import json
 import os
@@ -8,9 +15,10 @@ import random
 import requests
 import shared
 import shutil
+import socket
 import subprocess
 import sys
-from threading import local
+import threading
 import time
 import traceback
 import uuid
@@ -20,10 +28,15 @@ import uuid
 ####################
 
 def getThreadId():
-    if hasattr(tls, "number"):
-        return f" \033[34m[Thread {tls.batch}|{tls.number}]\033[0m"
+    id = taskID.get()
+    if id is not None:
+        (batch, number) = id
+        return f" \033[34m[Thread {batch}|{number}]\033[0m"
     return ""
 
+def setThreadId(batch, number):
+    taskID.set((batch, number))
+
 def getFormattedTimestamp():
     return datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
 
@@ -46,7 +59,7 @@ def info(*msg):
 # WORKLOAD UTILS #
 ##################
 
-def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbContent=[]):
+def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbContent=[], progress=None):
     """runs a workload on a given postgres port
     
     Arguments:
@@ -54,7 +67,9 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
     seed                        (optional) - seed for the RNG. if missing, on will be generated from the system time.
     makeLog                     (optional) - if set to True, all opens, statements, rollbacks and commits will be logged and returned (default: False)
     verification                (optional) - if set to True, will verify db content after each commit and save snapshots of db (default: False)
+    progress                    (optional) - dict that receives the live log and metadata, so the run can be observed while in progress (default: None)
     
+    The workload is replayed from the plan of the seed and dbContent, see workloadPlan.
     All other parameters are passed via the shared module
     """
     # TODO: document following shared inputs
@@ -74,16 +89,12 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
     if seedMissing:
         seed = int(time.time()) % 100_000
         debug("no seed given", level=3)
-    remainingTransactions = shared.NUM_TRANSACTIONS
-    debug("seed:", seed, "number of transactions:", remainingTransactions)
-    r = random.Random(seed)
-    openConns = []
-    finishedTransactions = []
-    lockedItems = set()
+    debug("seed:", seed, "number of transactions:", shared.NUM_TRANSACTIONS)
+    plan = workloadPlan(seed, dbContent)
+    dbContent = tableContent(dbContent)
+    # transaction id -> its connection and the statements run on it
+    transactions = {}
     log = []
-    (ccMu, ccVar) = shared.CONCURRENT_TRANSACTIONS
-    (sMu, sVar) = shared.STATEMENT_SIZE
-    (tMu, tVar) = shared.TRANSACTION_SIZE
     metadata = {
         "seed": seed,
         "seedGiven": not seedMissing,
@@ -96,22 +107,21 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
         "numCCUpdate": 0,
         "numCCDelete": 0,
         **getMetadata(),
-        "oldSnapshots": [],
+        "oldSnapshots": snapshotLog(dbContent),
         "initialLog": []
     }
-    cid = 0
-    aid = 0
-    while len(finishedTransactions) > 0 or len(openConns) > 0 or remainingTransactions > 0:
+    if progress is not None:
+        progress["log"] = log
+        progress["metadata"] = metadata
+    for step in plan:
         
-        ccs = r.gauss(ccMu, ccVar)
-        
-        if (len(openConns) == 0 and len(finishedTransactions) == 0 or ccs > (len(openConns) + len(finishedTransactions)) and hash(ccs) % 2 == 0) and remainingTransactions > 0:
+        if step[0] == "open":
         
             #########################
             # BEGIN NEW TRANSACTION #
             #########################
             
-            numStatements = max(round(r.gauss(tMu, tVar)), 1) # at least 1 stmt per transaction
+            (_, cid, numStatements) = step
             
             debug("New connection", cid, ",", numStatements, "statements, starting point is", dbContent, level=4)
             
@@ -132,232 +142,92 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
                     log.append({"result": "failure", "logs": [], "details": str(e).strip()})
                 metadata["result"] = "error"
                 metadata["details"] = str(e).strip()
-                return (dbContent, metadata, log)
-            
-            openConns.append({"c": newConn, "id": cid, "numStatements": numStatements, "statements": [], "localContent": dbContent.copy(), "lockedVals": set()})
+                return exportContent(dbContent, metadata, log)
             
-            remainingTransactions -= 1
-            cid += 1
+            transactions[cid] = {"c": newConn, "statements": []}
         
-        elif len(finishedTransactions) == 0:
+        elif step[0] in ["insert", "update", "delete"]:
             
             ####################################
             # EXECUTE STATEMENT ON TRANSACTION #
             ####################################
             
-            transactionIndex = r.randrange(len(openConns))
-            currConn = openConns[transactionIndex]
-            stmtTypeP = r.random()
-            count = max(1, round(r.gauss(sMu, sVar)))
+            (stmtType, cid, aid, count, values, expectCC) = step
+            currConn = transactions[cid]
+            metadata["num" + stmtType.capitalize()] += 1
             
-            expectCC = False
+            if expectCC:
+                metadata["numCC" + stmtType.capitalize()] += 1
+                debug("expecting serialization failure", level=4)
             
-            if stmtTypeP < shared.P_INSERT or len(set(currConn["localContent"]) - (lockedItems - currConn["lockedVals"])) < count:
-                
-                ##########
-                # INSERT #
-                ##########
-                
-                stmtType = "insert"
-                metadata["numInsert"] += 1
-                values = [(len(currConn["localContent"]) + i, aid) for i in range(count)]
-                
-                debug("insert", count, "on transaction", currConn["id"], values, level=4)
-                
-                if makeLog:
-                    log.append({
-                        "type": "insert",
-                        "timestamp": getTimestamp(),
-                        "transaction": currConn["id"],
-                        "statement": aid,
-                        "count": count,
-                        "values": values.copy()
-                    })
-                
-                fun = clientInsert
-                args = (values.copy())
+            debug(stmtType, count, "on transaction", cid, aid, values, level=4)
+            
+            if makeLog:
+                log.append({
+                    "type": stmtType,
+                    "timestamp": getTimestamp(),
+                    "transaction": cid,
+                    "statement": aid,
+                    "count": count,
+                    "values": values.copy()
+                })
+            
+            if stmtType == "insert":
+                (fun, args) = (clientInsert, values)
+            elif stmtType == "update":
+                (fun, args) = (clientUpdate, (values, aid))
+            else:
+                (fun, args) = (clientDelete, values)
+            # inserts never expect a concurrency conflict
+            conflicts = () if stmtType == "insert" else (psycopg2.errors.SerializationFailure, psycopg2.errors.LockNotAvailable)
+            
+            try:
                 
-                try:
+                if stmtType == "insert":
                     insert(currConn["c"], values)
-                    clientInsert((currConn["localContent"], values))
-                except Exception as e:
-                    if verification:
-                        error(type(e), "exception occurred during insert", e)
-                    if makeLog:
-                        log.append({"result": "failure", "logs": [], "details": str(e).strip()})
-                    metadata["result"] = "error"
-                    metadata["details"] = str(e).strip()
-                    return (dbContent, metadata, log)
-                
-            elif stmtTypeP < shared.P_INSERT + shared.P_UPDATE:
-                
-                ##########
-                # UPDATE #
-                ##########
-                
-                stmtType = "update"
-                metadata["numUpdate"] += 1
-                expectCC = r.random() < shared.P_SERIALIZATION_FAILURE and len(set(currConn["localContent"]) & (lockedItems - currConn["lockedVals"])) >= count
-                
-                debug(len(set(currConn["localContent"]) & (lockedItems - currConn["lockedVals"])), level=4)
-                
-                if expectCC:
-                    valsToEdit = [v for v in currConn["localContent"] if v in (lockedItems - currConn["lockedVals"])][-count:]
-                    metadata["numCCUpdate"] += 1
-                    debug("expecting serialization failure", level=4)
+                elif stmtType == "update":
+                    update(currConn["c"], values, aid)
                 else:
-                    valsToEdit = [v for v in currConn["localContent"] if not v in (lockedItems - currConn["lockedVals"])][-count:]
-                
-                
-                debug("update", count, "on transaction", currConn["id"], aid, valsToEdit, level=4)
-                
-                if makeLog:
-                    log.append({
-                        "type": "update",
-                        "timestamp": getTimestamp(),
-                        "transaction": currConn["id"],
-                        "statement": aid,
-                        "count": count,
-                        "values": valsToEdit.copy()
-                    })
-                
-                fun = clientUpdate
-                args = (valsToEdit.copy(), aid)
-                
-                try:
-                    
-                    update(currConn["c"], valsToEdit, aid)
-                    if expectCC:
-                        if verification:
-                            error("Expected concurrency conflict")
-                        if makeLog:
-                            log.append({"result": "failure", "logs": [], "details": "expected concurrency conflict"})
-                        metadata["result"] = "expected-concurrency-conflict"
-                        return (dbContent, metadata, log)
-                    clientUpdate((currConn["localContent"], (valsToEdit, aid)))
-                    currConn["lockedVals"] |= set(valsToEdit)
-                    lockedItems |= set(valsToEdit)
-                
-                except (psycopg2.errors.SerializationFailure, psycopg2.errors.LockNotAvailable):
-                    
-                    if not expectCC:
-                        error("Didn't expect concurrency conflict")
-                        if makeLog:
-                            log.append({"result": "failure", "logs": [], "details": "didn't expect concurrency conflict"})
-                        metadata["result"] = "didnt-expect-concurrency-conflict"
-                        return (dbContent, metadata, log)
-                    debug("concurrency conflict, need to rollback", level=4)
-                    currConn["c"].rollback()
-                    with currConn["c"].cursor() as c:
-                        c.execute(f"SELECT 0;") # used as BEGIN;
-                    currConn["statements"] = []
-                    currConn["localContent"] = dbContent.copy()
-                    lockedItems -= currConn["lockedVals"]
-                    currConn["lockedVals"] = set()
-                    aid += 1
-                    
-                    if makeLog:
-                        log.append({"result": "rollback", "logs": []})
-                    
-                    continue
-                
-                except Exception as e:
+                    delete(currConn["c"], values)
+                if expectCC:
                     if verification:
-                        error(type(e), "exception occurred during update,", ("cc" if expectCC else "no cc"), e)
+                        error("Expected concurrency conflict")
                     if makeLog:
-                        log.append({"result": "failure", "logs": [], "details": str(e).strip()})
-                    metadata["result"] = "error"
-                    metadata["details"] = str(e).strip()
-                    return (dbContent, metadata, log)
-                
-            else:
-                
-                ##########
-                # DELETE #
-                ##########
-                
-                stmtType = "delete"
-                metadata["numDelete"] += 1
-                expectCC = r.random() < shared.P_SERIALIZATION_FAILURE and len(set(currConn["localContent"]) & (lockedItems - currConn["lockedVals"])) >= count
-                
-                debug(len(set(currConn["localContent"]) & (lockedItems - currConn["lockedVals"])), level=4)
-                
-                if expectCC:
-                    valsToRm = [v for v in currConn["localContent"] if v in (lockedItems - currConn["lockedVals"])][-count:]
-                    metadata["numCCDelete"] += 1
-                    debug("expecting serialization failure", level=4)
-                else:
-                    valsToRm = [v for v in currConn["localContent"] if not v in (lockedItems - currConn["lockedVals"])][-count:]
+                        log.append({"result": "failure", "logs": [], "details": "expected concurrency conflict"})
+                    metadata["result"] = "expected-concurrency-conflict"
+                    return exportContent(dbContent, metadata, log)
+            
+            except conflicts:
                 
-                debug("delete", count, "on transaction", currConn["id"], valsToRm, level=4)
+                if not expectCC:
+                    error("Didn't expect concurrency conflict")
+                    if makeLog:
+                        log.append({"result": "failure", "logs": [], "details": "didn't expect concurrency conflict"})
+                    metadata["result"] = "didnt-expect-concurrency-conflict"
+                    return exportContent(dbContent, metadata, log)
+                debug("concurrency conflict, need to rollback", level=4)
+                currConn["c"].rollback()
+                with currConn["c"].cursor() as c:
+                    c.execute(f"SELECT 0;") # used as BEGIN;
+                currConn["statements"] = []
                 
                 if makeLog:
-                    log.append({
-                        "type": "delete",
-                        "timestamp": getTimestamp(),
-                        "transaction": currConn["id"],
-                        "statement": aid,
-                        "count": count,
-                        "values": valsToRm.copy()
-                    })
+                    log.append({"result": "rollback", "logs": []})
                 
-                fun = clientDelete
-                args = (valsToRm.copy())
-                
-                try:
-                    
-                    delete(currConn["c"], valsToRm)
-                    if expectCC:
-                        if verification:
-                            error("Expected concurrency conflict")
-                        if makeLog:
-                            log.append({"result": "failure", "logs": [], "details": "expected concurrency conflict"})
-                        metadata["result"] = "expected-concurrency-conflict"
-                        return (dbContent, metadata, log)
-                    clientDelete((currConn["localContent"], valsToRm))
-                    currConn["lockedVals"] |= set(valsToRm)
-                    lockedItems |= set(valsToRm)
-                
-                except (psycopg2.errors.SerializationFailure, psycopg2.errors.LockNotAvailable):
-                    
-                    if not expectCC:
-                        error("Didn't expect concurrency conflict")
-                        if makeLog:
-                            log.append({"result": "failure", "logs": [], "details": "didn't expect concurrency conflict"})
-                        metadata["result"] = "didnt-expect-concurrency-conflict"
-                        return (dbContent, metadata, log)
-                    debug("concurrency conflict, need to rollback", level=4)
-                    currConn["c"].rollback()
-                    with currConn["c"].cursor() as c:
-                        c.execute(f"SELECT 0;") # used as BEGIN;
-                    currConn["statements"] = []
-                    currConn["localContent"] = dbContent.copy()
-                    lockedItems -= currConn["lockedVals"]
-                    currConn["lockedVals"] = set()
-                    aid += 1
-                    
-                    if makeLog:
-                        log.append({"result": "rollback", "logs": []})
-                    
-                    continue
-                
-                except Exception as e:
-                    if verification:
-                        error(type(e), "exception occurred during delete,", ("cc" if expectCC else "no cc"), e)
-                    if makeLog:
-                        log.append({"result": "failure", "logs": [], "details": str(e).strip()})
-                    metadata["result"] = "error"
-                    metadata["details"] = str(e).strip()
-                    return (dbContent, metadata, log)
+                continue
             
-            aid = aid + 1
-            currConn["statements"].append((fun, args))
+            except Exception as e:
+                if verification:
+                    error(type(e), f"exception occurred during {stmtType},", ("cc" if expectCC else "no cc"), e)
+                if makeLog:
+                    log.append({"result": "failure", "logs": [], "details": str(e).strip()})
+                metadata["result"] = "error"
+                metadata["details"] = str(e).strip()
+                return exportContent(dbContent, metadata, log)
             
-            debug(stmtType, count, "in transaction", currConn["id"], level=4)
+            currConn["statements"].append((fun, args))
             
-            if len(currConn["statements"]) >= currConn["numStatements"]:
-                debug("all statements run on conn", currConn["id"], level=4)
-                finishedTransactions.append(openConns.pop(transactionIndex))
+            debug(stmtType, count, "in transaction", cid, level=4)
         
         else:
 
@@ -365,44 +235,44 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
             # FINISH TRANSACTION #
             ######################
             
-            transaction = finishedTransactions.pop(r.randrange(len(finishedTransactions)))
-            commit = r.random() < shared.P_COMMIT
+            (finish, cid) = step
+            transaction = transactions.pop(cid)
             
-            if commit:
+            if finish == "commit":
                 
                 ######################
                 # COMMIT TRANSACTION #
                 ######################
 
-                debug("commit transaction", transaction["id"], level=4)
+                debug("commit transaction", cid, level=4)
                 metadata["numCommit"] += 1
                 
                 if makeLog:
                     log.append({
                         "type": "commit",
                         "timestamp": getTimestamp(),
-                        "transaction": transaction["id"]
+                        "transaction": cid
                     })
                     
-                newContent = dbContent.copy()
-                for (f, args) in transaction["statements"]:
-                    f((newContent, args))
-                
                 try:
                     transaction["c"].commit()
                     transaction["c"].close()
                 except Exception as e:
                     if verification:
                         error(type(e), "exception occurred during commit", e)
+                    newContent = dbContent.copy()
+                    for (f, args) in transaction["statements"]:
+                        f((newContent, args))
                     metadata["altContent"] = newContent
                     if makeLog:
                         log.append({"result": "failure", "logs": [], "details": str(e).strip()})
                     metadata["result"] = "error"
                     metadata["details"] = str(e).strip()
-                    return (dbContent, metadata, log)
+                    return exportContent(dbContent, metadata, log)
+                for (f, args) in transaction["statements"]:
+                    f((dbContent, args))
                 if not verification:
-                    metadata["oldSnapshots"].append(dbContent)
-                dbContent = newContent
+                    metadata["oldSnapshots"].commit(transaction["statements"], dbContent)
             
             else:
                 
@@ -410,16 +280,14 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
                 # ROLLBACK TRANSACTION #
                 ########################
 
-                debug("rollback transaction", transaction["id"], level=4)
+                debug("rollback transaction", cid, level=4)
                 metadata["numRollback"] += 1
-                
-                lockedItems -= transaction["lockedVals"]
 
                 if makeLog:
                     log.append({
                         "type": "rollback",
                         "timestamp": getTimestamp(),
-                        "transaction": transaction["id"]
+                        "transaction": cid
                     })
                 
                 try:
@@ -432,7 +300,7 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
                         log.append({"result": "failure", "logs": [], "details": str(e).strip()})
                     metadata["result"] = "error"
                     metadata["details"] = str(e).strip()
-                    return (dbContent, metadata, log)
+                    return exportContent(dbContent, metadata, log)
             
             # debug(dbContent, level=4)
             try:
@@ -441,7 +309,7 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
                         log.append({"result": "failure", "logs": [], "details": "verify mismatch"})
                         metadata["result"] = "verify mismatch"
                         metadata["details"] = {"expected": dbContent, "actual": dump(shared.DB_TABLENAME, port)}
-                    return (dbContent, metadata, log)
+                    return exportContent(dbContent, metadata, log)
                 if shared.CHECKPOINT:
                     commandIntoFifo(id, "lazyfs::cache-checkpoint")
             except Exception as e:
@@ -449,7 +317,7 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
                     log.append({"result": "failure", "logs": [], "details": str(e).strip()})
                 metadata["result"] = "error"
                 metadata["details"] = str(e).strip()
-                return (dbContent, metadata, log)
+                return exportContent(dbContent, metadata, log)
         
         #########################
         # LOG SUCCESSFUL ACTION #
@@ -463,7 +331,15 @@ def runWorkload(port, id, seed=None, makeLog=False, verification=False, dbConten
     ###############################
 
     metadata["successful"] = True
-    return (dbContent, metadata, log)
+    return exportContent(dbContent, metadata, log)
+
+def exportContent(content, metadata, log):
+    """returns what runWorkload returns, with its tableContents turned into lists of rows"""
+    if "altContent" in metadata:
+        metadata["altContent"] = list(metadata["altContent"])
+    if isinstance(metadata.get("details"), dict) and "expected" in metadata["details"]:
+        metadata["details"]["expected"] = list(metadata["details"]["expected"])
+    return (list(content), metadata, log)
 
 def getMetadata():
     (ccMu, ccVar) = shared.CONCURRENT_TRANSACTIONS
@@ -540,6 +416,322 @@ def addLog(metadata, containerID, dest="restartLog"):
         else:
             metadata[dest].append(f"[{shared.SUT}] {sutlogs.pop(0)}")
 
+##################
+# WORKLOAD PLANS #
+##################
+
+# bumped whenever compileWorkload changes, so cached plans of older versions aren't replayed
+PLAN_VERSION = 1
+# number of plans kept in memory, hurdles of the same level replay the same plan
+PLANS_IN_MEMORY = 16
+
+plans = collections.OrderedDict()
+planLock = threading.Lock()
+# key -> lock held while the plan is compiled, so concurrent runs of the same plan compile it once
+compiling = {}
+
+def workloadPlan(seed, dbContent):
+    """the plan of the workload of seed starting on dbContent, compiled once and then read from the plan caches"""
+    key = md5(json.dumps([PLAN_VERSION, seed, getMetadata(), list(dbContent)]).encode()).hexdigest()
+    with planLock:
+        if key in plans:
+            plans.move_to_end(key)
+            return plans[key]
+        keyLock = compiling.setdefault(key, threading.Lock())
+    with keyLock:
+        with planLock:
+            if key in plans:
+                return plans[key]
+        plan = readPlan(key)
+        if plan is None:
+            debug("compiling workload plan", key, level=3)
+            plan = compileWorkload(seed, dbContent)
+            writePlan(key, plan)
+        with planLock:
+            plans[key] = plan
+            if len(plans) > PLANS_IN_MEMORY:
+                plans.popitem(last=False)
+            del compiling[key]
+    return plan
+
+def planPath(key):
+    return f"plans/{key}.json"
+
+def readPlan(key):
+    if shared.PLAN_CACHE == 0 or not os.path.isfile(planPath(key)):
+        return None
+    try:
+        with open(planPath(key)) as f:
+            plan = json.load(f)
+        # the modification time orders the plans for eviction
+        os.utime(planPath(key))
+    except Exception as e:
+        error("Invalid workload plan", planPath(key), e)
+        return None
+    for step in plan:
+        if step[0] in ["insert", "update", "delete"]:
+            step[4] = [tuple(row) for row in step[4]]
+    return plan
+
+def writePlan(key, plan):
+    if shared.PLAN_CACHE == 0:
+        return
+    os.makedirs(os.path.dirname(planPath(key)), exist_ok=True)
+    # only complete plans are read, even with several campaigns on this host
+    with open(f"{planPath(key)}.{os.getpid()}.partial", "w") as f:
+        json.dump(plan, f, separators=(",", ":"))
+    os.replace(f"{planPath(key)}.{os.getpid()}.partial", planPath(key))
+    try:
+        cached = [os.path.join("plans", entry) for entry in os.listdir("plans") if entry.endswith(".json")]
+        for old in sorted(cached, key=os.path.getmtime)[:max(0, len(cached) - shared.PLAN_CACHE)]:
+            debug("evicting least recently used workload plan", old, level=3)
+            os.remove(old)
+    except FileNotFoundError:
+        # evicted by another campaign at the same time
+        pass
+
+def compileWorkload(seed, dbContent):
+    """compiles the workload of seed starting on dbContent into the list of steps runWorkload replays
+    
+    Steps are
+    ["open", transaction, numStatements]
+    [statement type, transaction, statement, count, values, expectCC]
+    ["commit" or "rollback", transaction]
+    
+    Every statement is planned to behave as expected, a statement expecting a concurrency conflict rolls back
+    the statements of its transaction, which then starts over. A run stops at the first one that doesn't.
+    """
+    remainingTransactions = shared.NUM_TRANSACTIONS
+    r = random.Random(seed)
+    dbContent = tableContent(dbContent)
+    openConns = []
+    finishedTransactions = []
+    lockedItems = set()
+    plan = []
+    (ccMu, ccVar) = shared.CONCURRENT_TRANSACTIONS
+    (sMu, sVar) = shared.STATEMENT_SIZE
+    (tMu, tVar) = shared.TRANSACTION_SIZE
+    cid = 0
+    aid = 0
+    while len(finishedTransactions) > 0 or len(openConns) > 0 or remainingTransactions > 0:
+        
+        ccs = r.gauss(ccMu, ccVar)
+        
+        if (len(openConns) == 0 and len(finishedTransactions) == 0 or ccs > (len(openConns) + len(finishedTransactions)) and hash(ccs) % 2 == 0) and remainingTransactions > 0:
+            
+            numStatements = max(round(r.gauss(tMu, tVar)), 1) # at least 1 stmt per transaction
+            plan.append(["open", cid, numStatements])
+            openConns.append({"id": cid, "numStatements": numStatements, "statements": [], "localContent": dbContent.copy(), "lockedVals": set(), "lockedByOthers": dbContent.common(lockedItems)})
+            
+            remainingTransactions -= 1
+            cid += 1
+        
+        elif len(finishedTransactions) == 0:
+            
+            transactionIndex = r.randrange(len(openConns))
+            currConn = openConns[transactionIndex]
+            stmtTypeP = r.random()
+            count = max(1, round(r.gauss(sMu, sVar)))
+            
+            expectCC = False
+            # rows of the transaction's view locked by other transactions
+            others = currConn["lockedByOthers"]
+            
+            if stmtTypeP < shared.P_INSERT or currConn["localContent"].distinct() - len(others) < count:
+                values = [(len(currConn["localContent"]) + i, aid) for i in range(count)]
+                plan.append(["insert", currConn["id"], aid, count, values, False])
+                clientInsert((currConn["localContent"], values))
+                currConn["statements"].append((clientInsert, values))
+            
+            else:
+                stmtType = "update" if stmtTypeP < shared.P_INSERT + shared.P_UPDATE else "delete"
+                expectCC = r.random() < shared.P_SERIALIZATION_FAILURE and len(others) >= count
+                values = currConn["localContent"].last(count, others, among=expectCC)
+                plan.append([stmtType, currConn["id"], aid, count, values, expectCC])
+                
+                if expectCC:
+                    currConn["statements"] = []
+                    currConn["localContent"] = dbContent.copy()
+                    lockedItems -= currConn["lockedVals"]
+                    for other in openConns:
+                        other["lockedByOthers"] -= currConn["lockedVals"]
+                    currConn["lockedVals"] = set()
+                    currConn["lockedByOthers"] = dbContent.common(lockedItems)
+                    aid += 1
+                    continue
+                
+                (fun, args) = (clientUpdate, (values, aid)) if stmtType == "update" else (clientDelete, values)
+                fun((currConn["localContent"], args))
+                currConn["statements"].append((fun, args))
+                currConn["lockedVals"] |= set(values)
+                lockedItems |= set(values)
+                for other in openConns:
+                    if other is not currConn:
+                        other["lockedByOthers"] |= other["localContent"].common(values)
+            
+            aid = aid + 1
+            
+            if len(currConn["statements"]) >= currConn["numStatements"]:
+                finishedTransactions.append(openConns.pop(transactionIndex))
+        
+        else:
+            
+            transaction = finishedTransactions.pop(r.randrange(len(finishedTransactions)))
+            
+            if r.random() < shared.P_COMMIT:
+                plan.append(["commit", transaction["id"]])
+                for (f, args) in transaction["statements"]:
+                    f((dbContent, args))
+            
+            else:
+                plan.append(["rollback", transaction["id"]])
+                lockedItems -= transaction["lockedVals"]
+                for other in openConns:
+                    other["lockedByOthers"] -= transaction["lockedVals"]
+    
+    return plan
+
+################
+# CLIENT MODEL #
+################
+
+class tableContent:
+    """the rows (a, b) the test table is expected to hold, in the order they were inserted
+    
+    Each column is an array, with an index from each row to its positions, so inserts, updates and deletes
+    don't scan the table. Deleted rows are marked and only compacted away once they make up half of the
+    arrays. Rows can occur more than once, updates and deletes apply to all of their occurrences.
+    """
+    def __init__(self, rows=()):
+        self._a = array.array("q")
+        self._b = array.array("q")
+        self._alive = bytearray()
+        # row -> positions, tuples so that copies can share them
+        self._index = {}
+        self._dead = 0
+        self.insert(rows)
+
+    def copy(self):
+        other = tableContent()
+        other._a = self._a[:]
+        other._b = self._b[:]
+        other._alive = self._alive[:]
+        other._index = self._index.copy()
+        other._dead = self._dead
+        return other
+
+    def __len__(self):
+        return len(self._alive) - self._dead
+
+    def __iter__(self):
+        return itertools.compress(zip(self._a, self._b), self._alive)
+
+    def __contains__(self, row):
+        return row in self._index
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def distinct(self):
+        return len(self._index)
+
+    def common(self, rows):
+        """the distinct rows of rows that the table holds"""
+        return {row for row in rows if row in self._index}
+
+    def last(self, count, rows, among=True):
+        """the last count rows of the table in order that are (or with among=False aren't) in rows"""
+        if among:
+            positions = sorted(heapq.nlargest(count, (p for row in rows for p in self._index.get(row, ()))))
+        else:
+            positions = []
+            p = len(self._alive) - 1
+            while p >= 0 and len(positions) < count:
+                if self._alive[p] and not (self._a[p], self._b[p]) in rows:
+                    positions.append(p)
+                p -= 1
+            positions.reverse()
+        return [(self._a[p], self._b[p]) for p in positions]
+
+    def insert(self, rows):
+        for (a, b) in rows:
+            self._index[(a, b)] = self._index.get((a, b), ()) + (len(self._alive),)
+            self._a.append(a)
+            self._b.append(b)
+            self._alive.append(1)
+
+    def update(self, rows, b):
+        # all positions are looked up first, an updated row is never updated again
+        positions = [p for row in set(rows) for p in self._index.pop(row, ())]
+        for p in positions:
+            self._b[p] = b
+            self._index[(self._a[p], b)] = self._index.get((self._a[p], b), ()) + (p,)
+
+    def delete(self, rows):
+        for row in set(rows):
+            for p in self._index.pop(row, ()):
+                self._alive[p] = 0
+                self._dead += 1
+        # rows are mostly deleted from the end, which then doesn't need to be skipped by last
+        while len(self._alive) > 0 and not self._alive[-1]:
+            self._a.pop()
+            self._b.pop()
+            self._alive.pop()
+            self._dead -= 1
+        if self._dead > 1024 and 2 * self._dead > len(self._alive):
+            rows = list(self)
+            self.__init__(rows)
+
+class snapshotLog:
+    """the content of the test table after every commit of a workload, like a list of the contents before each commit
+    
+    Only the content the workload started from and the statements of each commit are kept, along with a copy of
+    the content every CHECKPOINT_INTERVAL commits. A snapshot is replayed from the closest copy when it is read.
+    """
+    CHECKPOINT_INTERVAL = 32
+
+    def __init__(self, base=()):
+        self._checkpoints = [tableContent(base)]
+        self._commits = []
+
+    def __len__(self):
+        return len(self._commits)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._commits)
+        if not 0 <= i < len(self._commits):
+            raise IndexError("snapshot index out of range")
+        return list(self.after(i))
+
+    def commit(self, statements, content):
+        """records the statements of a commit, content is the table after it"""
+        self._commits.append(list(statements))
+        if len(self._commits) % self.CHECKPOINT_INTERVAL == 0:
+            self._checkpoints.append(content.copy())
+
+    def after(self, commits):
+        """the content after the first commits commits, as a tableContent of its own"""
+        content = self._checkpoints[commits // self.CHECKPOINT_INTERVAL].copy()
+        for statements in self._commits[commits - commits % self.CHECKPOINT_INTERVAL:commits]:
+            for (f, args) in statements:
+                f((content, args))
+        return content
+
+    def truncated(self, commits):
+        """the log of only the first commits commits, sharing its state with this one"""
+        other = snapshotLog()
+        other._checkpoints = self._checkpoints[:commits // self.CHECKPOINT_INTERVAL + 1]
+        other._commits = self._commits[:commits]
+        return other
+
+    def export(self):
+        """the log as json: the content the workload started from and the statements of each commit"""
+        return {
+            "base": list(self._checkpoints[0]),
+            "commits": [[[f.__name__, args] for (f, args) in statements] for statements in self._commits]
+        }
+
 #####################
 # SQL CONTROL UTILS #
 #####################
@@ -614,46 +806,59 @@ def create(name, schema, port):
         conn.commit()
     debug("\033[1mdone\033[0m creating db")
 
+# how statements select the rows of a list, by SUT, see rowPredicate. SUTs not listed use "or-chain".
+ROW_PREDICATES = {
+    "postgres": "in-list",
+    "sqlite": "in-values"
+}
+
+def rowValues(vals):
+    return ", ".join(f"({a}, {b})" for (a, b) in vals)
+
+def rowPredicate(vals):
+    """the WHERE clause matching the rows in vals, including all duplicates of them"""
+    strategy = ROW_PREDICATES.get(shared.SUT, "or-chain")
+    if strategy == "in-list":
+        return f"(a, b) IN ({rowValues(vals)})"
+    if strategy == "in-values":
+        # sqlite only compares row values with subqueries
+        return f"(a, b) IN (VALUES {rowValues(vals)})"
+    return " or ".join(f"(a = {a} and b = {b})" for (a, b) in vals)
+
+def modify(conn, stmt, vals):
+    """runs an UPDATE or DELETE stmt on the rows in vals, failing instead of waiting on rows locked by others"""
+    cur = conn.cursor()
+    predicate = rowPredicate(vals)
+    stmt = f"{stmt} WHERE {predicate};"
+    if shared.SUT == "postgres":
+        # the rows are locked first, in the same round trip
+        stmt = f"SELECT * FROM {shared.DB_TABLENAME} WHERE {predicate} FOR UPDATE NOWAIT; {stmt}"
+    cur.execute(stmt)
+    debug(cur.rowcount, level=4)
+
 def insert(conn, values):
     cur = conn.cursor()
-    cur.execute("INSERT INTO " + shared.DB_TABLENAME + " VALUES " + ', '.join(str(v) for v in values) + ";")
+    cur.execute(f"INSERT INTO {shared.DB_TABLENAME} VALUES {rowValues(values)};")
     debug(cur.rowcount, level=4)
 
 def clientInsert(args):
     (content, values) = args
-    content[len(content):] = values
+    content.insert(values)
 
 def update(conn, vals, newAction):
-    cur = conn.cursor()
-    if shared.SUT == "postgres":
-        cur.execute("SELECT * FROM " + shared.DB_TABLENAME + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + " FOR UPDATE NOWAIT;")
-        cur.execute("UPDATE " + shared.DB_TABLENAME + " SET b = " + str(newAction) + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + ";")
-    else:
-        cur.execute("UPDATE " + shared.DB_TABLENAME + " SET b = " + str(newAction) + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + ";")
-    debug(cur.rowcount, level=4)
+    modify(conn, f"UPDATE {shared.DB_TABLENAME} SET b = {newAction}", vals)
 
 def clientUpdate(args):
     (content, vals) = args
     (valsToEdit, newAction) = vals
-    for i in range(len(content)):
-        (a, b) = content[i]
-        if (a, b) in valsToEdit:
-            content[i] = (a, newAction)
+    content.update(valsToEdit, newAction)
 
 def delete(conn, vals):
-    cur = conn.cursor()
-    if shared.SUT == "postgres":
-        cur.execute("SELECT * FROM " + shared.DB_TABLENAME + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + " FOR UPDATE NOWAIT;")
-        cur.execute("DELETE FROM " + shared.DB_TABLENAME + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + ";")
-    else:
-        cur.execute("DELETE FROM " + shared.DB_TABLENAME + " WHERE " + " or ".join(["(a = " + str(a) + " and b = " + str(b) + ")" for (a, b) in vals]) + ";")
-    debug(cur.rowcount, level=4)
+    modify(conn, f"DELETE FROM {shared.DB_TABLENAME}", vals)
 
 def clientDelete(args):
     (content, valsToRm) = args
-    for v in valsToRm:
-        while v in content:
-            content.remove(v)
+    content.delete(valsToRm)
 
 def dump(name, port):
     with connect(port) as conn:
@@ -691,89 +896,220 @@ def verify(name, content, port, kill=False, supressErrors=False):
 # SUT CONTAINER CONTROL UTILS #
 ###############################
 
-def buildSUTImage(wal_sync_method=None):
-    if os.path.exists(f"/dev/shm/ctf/{shared.SUT}"):
-        error(f"Another instance of CrashTestFuzz testing {shared.SUT} is running or a previous run failed.\nIn the latter case, clean up all orphaned docker containers and remove /dev/shm/ctf/{shared.SUT} as well as ./SUT/{shared.SUT}/container", kill=True)
-    os.makedirs(f"/dev/shm/ctf/{shared.SUT}", exist_ok=True)
-    os.symlink(f"/dev/shm/ctf/{shared.SUT}", os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "container"]))
+def buildSUTImage(wal_sync_method=None, resume=False):
+    # a resumed run takes over the container root of the run it resumes, see reapOrphans
+    if os.path.exists(f"{shared.CONTAINER_ROOT}/{shared.SUT}") and not resume:
+        error(f"Another instance of CrashTestFuzz testing {shared.SUT} is running or a previous run failed.\nIn the latter case, clean up all orphaned docker containers and remove {shared.CONTAINER_ROOT}/{shared.SUT} as well as ./SUT/{shared.SUT}/container,\nor continue the failed run with --resume", kill=True)
+    os.makedirs(f"{shared.CONTAINER_ROOT}/{shared.SUT}", exist_ok=True)
+    if not os.path.lexists(os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "container"])):
+        os.symlink(f"{shared.CONTAINER_ROOT}/{shared.SUT}", os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "container"]))
+    if supportsReflinks(f"{shared.CONTAINER_ROOT}/{shared.SUT}"):
+        debug("container root supports reflinks, duplicating containers is copy-on-write", level=1)
+    else:
+        debug("container root doesn't support reflinks, duplicating containers copies all data", level=1)
+    if engine.available():
+        debug("controlling containers through the Docker Engine API", level=1)
+    else:
+        debug("controlling containers through the SUT scripts", level=1)
+    tag = imageTag(wal_sync_method)
+    if shared.IMAGE_CACHE > 0 and docker("image", "inspect", tag).returncode == 0:
+        debug("reusing cached SUT image", tag, level=1)
+        r = docker("tag", tag, f"lazy{shared.SUT}")
+        if r.returncode != 0:
+            error("tagging cached SUT image failed with code", r.returncode)
+            error(r.stderr.decode(), kill=True)
+        touchCachedImage(tag)
+        return
     debug("building SUT, " + "no WAL_SYNC_METHOD given" if wal_sync_method is None else "WAL_SYNC_METHOD is " + wal_sync_method, level=2)
     r = subprocess.run(["bash", "./build-image.sh", ("" if wal_sync_method is None else wal_sync_method)], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if r.returncode != 0:
         error("building SUT failed with code", r.returncode)
         error(r.stdout.decode())
         error(r.stderr.decode(), kill=True)
+    if shared.IMAGE_CACHE > 0:
+        # cleanup-all.sh only removes the untagged name, the cache tag keeps the image alive
+        r = docker("tag", f"lazy{shared.SUT}", tag)
+        if r.returncode != 0:
+            error("caching SUT image failed with code", r.returncode)
+            error(r.stderr.decode())
+        else:
+            touchCachedImage(tag)
     debug("\033[1mdone\033[0m building", level=2)
 
-def prepHostEnvironment(containerID=None):
+async def runScript(script, *args):
+    """runs one of the SUT's bash scripts without blocking the event loop, returns (returncode, stdout, stderr)"""
+    p = await asyncio.create_subprocess_exec("bash", script, *args, cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), env={**os.environ, "CTF_RUN": shared.TEST_RUN}, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (stdout, stderr) = await p.communicate()
+    return (p.returncode, stdout, stderr)
+
+# container actions the engine backend can take over from the scripts
+ENGINE_ACTIONS = {
+    "run-container": engine.runContainer,
+    "stop-sut": engine.stopSUT,
+    "restart-sut": engine.restartSUT,
+    "stop-container": engine.stopContainer,
+    "pause-container": engine.pauseContainer,
+    "unpause-container": engine.unpauseContainer,
+}
+
+async def controlContainer(action, containerID, *args):
+    """runs a container action through the Docker Engine API if possible, through the SUT's script otherwise"""
+    if not engine.available() and action in ["pause-container", "unpause-container"]:
+        # no script needed, the docker CLI can do this for any SUT following the lazy<sut>-<id> naming
+        p = await asyncio.create_subprocess_exec("docker", action.split("-")[0], engine.containerName(containerID), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (stdout, stderr) = await p.communicate()
+        return (p.returncode, stdout, stderr)
+    if not engine.available():
+        return await runScript(f"./{action}.sh", containerID, *[str(a) for a in args])
+    try:
+        return await asyncio.to_thread(ENGINE_ACTIONS[action], containerID, *args)
+    except Exception as e:
+        return (1, b"", f"Docker Engine API: {e}".encode())
+
+def supportsReflinks(directory):
+    """checks whether files in directory can be cloned copy-on-write, which duplicate-container.sh makes use of via cp --reflink=auto"""
+    source = os.path.join(directory, ".reflink-probe")
+    try:
+        with open(source, "w") as f:
+            f.write("probe")
+        r = subprocess.run(["cp", "--reflink=always", source, source + "-clone"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return r.returncode == 0
+    finally:
+        for path in [source, source + "-clone"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+async def prepHostEnvironment(containerID=None):
     debug("preparing host environment", level=2)
     if containerID is None:
         containerID = str(uuid.uuid4())
         debug("no container ID given, generated ID " + containerID, level=3)
-    r = subprocess.run(["bash", "./prep-env.sh", containerID], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if r.returncode != 0:
-        error("preparing host environment failed with code", r.returncode)
-        error(r.stdout.decode())
-        error(r.stderr.decode(), kill=True)
+    (code, stdout, stderr) = await runScript("./prep-env.sh", containerID)
+    if code != 0:
+        error("preparing host environment failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode(), kill=True)
     debug("\033[1mdone\033[0m preparing env", level=2)
     return containerID
 
-def duplicateContainer(containerID, newContainerID=None):
+async def duplicateContainer(containerID, newContainerID=None):
     debug("duplicating container", containerID, level=2)
     if newContainerID is None:
         newContainerID = str(uuid.uuid4())
         debug("no container ID given, generated ID " + newContainerID, level=3)
-    r = subprocess.run(["bash", "./duplicate-container.sh", containerID, newContainerID], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (code, stdout, stderr) = await runScript("./duplicate-container.sh", containerID, newContainerID)
     # TODO: duplicate logs from prev runs
-    if r.returncode != 0:
-        error("duplicating container failed with code", r.returncode)
-        error(r.stdout.decode())
-        error(r.stderr.decode(), kill=True)
+    if code != 0:
+        error("duplicating container failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode(), kill=True)
     debug("\033[1mdone\033[0m duplicating container", level=2)
     return newContainerID
 
-def runContainer(containerID, port=0, crashcmd=""):
+async def runContainer(containerID, port=0, crashcmd=""):
     debug("running container", containerID, level=2)
-    r = subprocess.run(["bash", "./run-container.sh", containerID, str(port), crashcmd], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if r.returncode != 0:
-        error("running container failed with code", r.returncode)
-        error(r.stdout.decode())
-        error(r.stderr.decode(), kill=True)
-    if port == 0:
-        debug("No port given", level=3)
-        port = getPort(containerID)
-    debug("\033[1mdone\033[0m running", level=2)
-    return port
+    for attempt in range(1, 6):
+        # probing for a free port binds sockets, which can take a while on a busy host
+        hostPort = port if port != 0 else await asyncio.to_thread(reservePort, containerID)
+        (code, stdout, stderr) = await controlContainer("run-container", containerID, hostPort, crashcmd)
+        if code == 0 or port != 0 or not "already allocated" in stderr.decode():
+            break
+        # taken by something outside of this run, the created container still holds the name
+        debug("port", hostPort, "already allocated on the host, attempt", attempt, level=2)
+        await stopContainer(containerID, supressErrors=True)
+    if code != 0:
+        error("running container failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode(), kill=True)
+    debug("\033[1mdone\033[0m running on port", hostPort, level=2)
+    return hostPort
 
-def stopSUT(containerID, supressErrors=False):
+async def stopSUT(containerID, supressErrors=False):
     debug("stopping SUT", containerID, level=2)
-    r = subprocess.run(["bash", "./stop-sut.sh", containerID], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if r.returncode != 0 and not supressErrors:
-        error("stopping SUT failed with code", r.returncode)
-        error(r.stdout.decode())
-        error(r.stderr.decode(), kill=True)
+    (code, stdout, stderr) = await controlContainer("stop-sut", containerID)
+    if code != 0 and not supressErrors:
+        error("stopping SUT failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode(), kill=True)
     debug("\033[1mdone\033[0m stopping SUT", level=2)
 
-def stopContainer(containerID, supressErrors=False):
+def supportsRestart():
+    """whether the SUT can be restarted inside its running container, see restartSUT"""
+    return os.path.exists(os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts", "restart-sut.sh"]))
+
+async def quiesceSUT(containerID):
+    """stops the SUT of a container for restartSUT, waiting until its persisted data doesn't change anymore"""
+    debug("stopping SUT in place", containerID, level=2)
+    (code, stdout, stderr) = await controlContainer("restart-sut", containerID, "stop")
+    if code != 0:
+        error("stopping SUT in place failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
+    debug("\033[1mdone\033[0m stopping SUT in place", level=2)
+
+async def restartSUT(containerID):
+    """restarts the SUT of a container stopped by quiesceSUT, on a fresh lazyfs without injected faults
+    
+    The logs of the container are emptied first, so they only show the restart like those of a new container.
+    """
+    debug("restarting SUT", containerID, level=2)
+    for name in ["lazyfs", shared.SUT]:
+        open(f"SUT/{shared.SUT}/container/container-{containerID}/{name}.log", "w").close()
+    (code, stdout, stderr) = await controlContainer("restart-sut", containerID, "start")
+    if code != 0:
+        error("restarting SUT failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
+    debug("\033[1mdone\033[0m restarting SUT", level=2)
+
+async def stopContainer(containerID, supressErrors=False):
     debug("stopping container", containerID, level=2)
-    r = subprocess.run(["bash", "./stop-container.sh", containerID], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if r.returncode != 0 and not supressErrors:
-        error("stopping container failed with code", r.returncode)
-        error(r.stdout.decode())
-        error(r.stderr.decode())
+    (code, stdout, stderr) = await controlContainer("stop-container", containerID)
+    if code != 0 and not supressErrors:
+        error("stopping container failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
+    releasePort(containerID)
     debug("\033[1mdone\033[0m stopping container", level=2)
 
-def cleanupEnv(containerID):
-    debug("cleaning up host environment", containerID, level=2)
-    r = subprocess.run(["bash", "./cleanup-env.sh", containerID], cwd=os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "scripts"]), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+async def pauseContainer(containerID):
+    debug("pausing container", containerID, level=2)
+    (code, stdout, stderr) = await controlContainer("pause-container", containerID)
+    if code != 0:
+        error("pausing container failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
+    return code == 0
+
+async def unpauseContainer(containerID):
+    debug("unpausing container", containerID, level=2)
+    (code, stdout, stderr) = await controlContainer("unpause-container", containerID)
+    if code != 0:
+        error("unpausing container failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
+    return code == 0
+
+async def removeContainer(containerID):
+    """removes a container whatever state it is in, e.g. one that can't be unpaused"""
+    debug("removing container", containerID, level=2)
+    r = await asyncio.to_thread(docker, "rm", "-f", engine.containerName(containerID))
     if r.returncode != 0:
-        error("cleaning up host environment failed with code", r.returncode)
-        error(r.stdout.decode())
+        error("removing container failed with code", r.returncode)
         error(r.stderr.decode())
+
+async def cleanupEnv(containerID):
+    debug("cleaning up host environment", containerID, level=2)
+    (code, stdout, stderr) = await runScript("./cleanup-env.sh", containerID)
+    if code != 0:
+        error("cleaning up host environment failed with code", code)
+        error(stdout.decode())
+        error(stderr.decode())
     debug("\033[1mdone\033[0m cleaning up env", level=2)
 
-def cleanupContainer(containerID):
-    stopContainer(containerID, supressErrors=True)
-    cleanupEnv(containerID)
+async def cleanupContainer(containerID):
+    await stopContainer(containerID, supressErrors=True)
+    await cleanupEnv(containerID)
 
 def cleanupEnvs(supressErrors=False):
     debug("cleaning up all envs", level=2)
@@ -792,61 +1128,317 @@ def cleanupAll(supressErrors=False):
         error(r.stdout.decode())
         error(r.stderr.decode())
     os.remove(os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "container"]))
-    os.rmdir(f"/dev/shm/ctf/{shared.SUT}")
+    os.rmdir(f"{shared.CONTAINER_ROOT}/{shared.SUT}")
     debug("\033[1mdone\033[0m cleaning up", level=2)
 
-def getPort(containerID):
-    port = 0
-    tries = 1
-    while port == 0:
-        result = subprocess.check_output("docker ps", shell=True).decode().strip()
-        debug("Looking for container port", level=3)
-        if tries >= 10:
-            debug("this is attempt", tries, level=3)
-        debug("Got output\n", result, level=4)
-        if containerID in result:
-            lines = result.splitlines()
-            for l in lines:
-                if containerID in l:
-                    port = int(l.split("0.0.0.0:")[1].split("->5432")[0])
-                    debug("got port", port, level=3)
-                    return port
-        else:
-            if tries == 20:
-                error("Container port for", containerID, "not found after 20 tries, likely didn't start.")
-                exit(1)
-            tries += 1
-            time.sleep(0.5)
-
-def waitUntilAvailable(id, port, timeout=0, kill=False, supressErrors=False):
-    secs = 0
+# logs/<sut>/<run>/run.pid of this process, locked until it exits. The kernel drops the lock with the process,
+# so a run.pid left by kill -9 or a reboot doesn't count as alive, whoever has its pid by now.
+runLock = None
+
+def lockRun(resume=False):
+    """locks logs/<sut>/<run>/run.pid for this process, refuses to resume while a run of the SUT holds its lock"""
+    global runLock
+    if resume:
+        # all runs of a SUT share its container root, so no other run may be alive either
+        for run in os.listdir(f"logs/{shared.SUT}"):
+            pid = runProcess(run)
+            if pid is not None:
+                error(f"Run {run} of {shared.SUT} is still alive as process {pid}, stop it before resuming", kill=True)
+    runLock = open(f"logs/{shared.SUT}/{shared.TEST_RUN}/run.pid", "a+")
+    try:
+        fcntl.flock(runLock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        error(f"Run {shared.TEST_RUN} of {shared.SUT} is already running", kill=True)
+    runLock.truncate(0)
+    runLock.write(str(os.getpid()))
+    runLock.flush()
+
+def unlockRun():
+    global runLock
+    if runLock is not None:
+        os.remove(f"logs/{shared.SUT}/{shared.TEST_RUN}/run.pid")
+        runLock.close()
+        runLock = None
+
+def runProcess(run):
+    """pid of the process holding the lock of run, None if no process does"""
+    try:
+        f = open(f"logs/{shared.SUT}/{run}/run.pid")
+    except OSError:
+        return None
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return f.read().strip()
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return None
+
+def reapOrphans(keep=[]):
+    """removes the containers and environments a terminated run left behind, except the environments in keep
+    
+    Only containers labelled with the ID of this run are removed, see run-container.sh and engine.runContainer.
+    """
+    debug("reaping orphaned containers", level=2)
+    r = docker("ps", "-aq", "--filter", f"name=lazy{shared.SUT}-", "--filter", f"label={engine.RUN_LABEL}={shared.TEST_RUN}")
+    orphans = r.stdout.decode().split()
+    if len(orphans) > 0:
+        info("Removing", len(orphans), "orphaned containers")
+        r = docker("rm", "-f", *orphans)
+        if r.returncode != 0:
+            error("removing orphaned containers failed with code", r.returncode)
+            error(r.stderr.decode())
+    if os.path.isdir(f"{shared.CONTAINER_ROOT}/{shared.SUT}"):
+        for entry in os.listdir(f"{shared.CONTAINER_ROOT}/{shared.SUT}"):
+            if not entry in [f"container-{id}" for id in keep]:
+                shutil.rmtree(f"{shared.CONTAINER_ROOT}/{shared.SUT}/{entry}", ignore_errors=True)
+    debug("\033[1mdone\033[0m reaping", level=2)
+
+# log line a SUT prints once it accepts connections, checked before probing
+READY_LOG_LINES = {
+    "postgres": "database system is ready to accept connections",
+}
+
+async def waitUntilAvailable(id, port, timeout=0, kill=False, supressErrors=False):
+    started = time.monotonic()
+    backoff = 0.05
+    needle = READY_LOG_LINES.get(shared.SUT)
+    (logSeen, offset, tail) = (needle is None, 0, "")
     while True:
-        if shared.SUT == "postgres":
-            logs = "\n".join(readLogs(id, "postgres")[-20:])
-            if "database system is ready to accept connections" in logs:
-                sleep(3)
-                return True
-        elif shared.SUT in ["duckdb", "duckdb-assert", "sqlite"]:
-            try:
-                if requests.get(f"http://127.0.0.1:{port}/ping").text == '"pong"':
-                    sleep(3)
-                    return True
-            except:
-                pass
-        else:
-            try:
-                c = connect(port)
-                c.close()
-                sleep(3)
-                return True
-            except:
-                pass
-        if timeout != 0 and secs >= timeout:
+        if not logSeen:
+            (chunk, offset) = tailLog(id, shared.SUT, offset)
+            logSeen = needle in tail + chunk
+            tail = (tail + chunk)[-len(needle):]
+        if logSeen and await asyncio.to_thread(probeTransaction, port):
+            debug("SUT of container", id, "available after", f"{time.monotonic() - started:.2f}", "seconds", level=2)
+            startLatencies.append(time.monotonic() - started)
+            return True
+        if timeout != 0 and time.monotonic() - started >= timeout:
             if not supressErrors:
                 error("Timeout while waiting for system start after", timeout, "seconds", kill=kill)
             return False
-        secs += 1
-        sleep(1)
+        await asyncio.sleep(backoff)
+        backoff = min(2 * backoff, 1)
+
+def probeTransaction(port):
+    # open a connection the same way the workload does, this already runs its first statement
+    try:
+        c = connect(port)
+        c.close()
+        return True
+    except:
+        return False
+
+###############
+# IMAGE CACHE #
+###############
+
+def docker(*args):
+    return subprocess.run(["docker", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def imageTag(wal_sync_method):
+    """tag of the SUT image built from the current docker/ directory with the given WAL_SYNC_METHOD"""
+    h = md5()
+    directory = os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "docker"])
+    for (root, dirs, files) in os.walk(directory):
+        # bytecode left behind by running the helpers on the host isn't part of the sources
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if name.endswith(".pyc"):
+                continue
+            path = os.path.join(root, name)
+            h.update(os.path.relpath(path, directory).encode() + b"\0")
+            with open(path, "rb") as f:
+                h.update(f.read() + b"\0")
+    # build-image.sh also passes the host user, which ends up in the image
+    h.update(f"{wal_sync_method or ''}\0{os.getuid()}\0{os.getgid()}".encode())
+    return f"lazy{shared.SUT}:ctf-{h.hexdigest()[:16]}"
+
+def imageCacheFile():
+    return os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "images.json"])
+
+def readImageCache():
+    # image tag -> last use (unix time)
+    try:
+        with open(imageCacheFile()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def writeImageCache(cache):
+    with open(imageCacheFile(), "w") as f:
+        json.dump(cache, f, indent=4)
+
+def touchCachedImage(tag):
+    cache = readImageCache()
+    cache[tag] = time.time()
+    for old in sorted(cache, key=cache.get)[:max(0, len(cache) - shared.IMAGE_CACHE)]:
+        debug("evicting least recently used SUT image", old, level=1)
+        docker("image", "rm", old)
+        removeCachedTemplates(old)
+        del cache[old]
+    writeImageCache(cache)
+
+def clearImageCache():
+    cache = readImageCache()
+    for tag in cache:
+        debug("removing cached SUT image", tag, level=1)
+        docker("image", "rm", tag)
+        removeCachedTemplates(tag)
+    writeImageCache({})
+
+##################
+# TEMPLATE CACHE #
+##################
+
+# persisted data of prepared templates, in SUT/<sut>/templates/<hash of the image>-<key>, evicted along with the image
+
+def templateCacheDirectory(tag, key):
+    return os.sep.join([os.path.dirname(os.path.abspath(__file__)), "SUT", shared.SUT, "templates", f"{tag.split('ctf-')[1]}-{key}"])
+
+def restoreCachedTemplate(containerID, tag, key):
+    """fills a prepared environment with the cached persisted data, returns whether there was any"""
+    directory = templateCacheDirectory(tag, key)
+    if shared.IMAGE_CACHE == 0 or not os.path.isdir(directory):
+        return False
+    target = f"SUT/{shared.SUT}/container/container-{containerID}/persisted"
+    shutil.rmtree(target)
+    r = subprocess.run(["cp", "-r", "--reflink=auto", directory, target], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if r.returncode != 0:
+        error("restoring cached template failed with code", r.returncode)
+        error(r.stderr.decode())
+        return False
+    return True
+
+def cacheTemplate(containerID, tag, key):
+    directory = templateCacheDirectory(tag, key)
+    if shared.IMAGE_CACHE == 0 or os.path.isdir(directory):
+        return
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    r = subprocess.run(["cp", "-r", "--reflink=auto", f"SUT/{shared.SUT}/container/container-{containerID}/persisted", directory + ".partial"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if r.returncode != 0:
+        error("caching template failed with code", r.returncode)
+        error(r.stderr.decode())
+        shutil.rmtree(directory + ".partial", ignore_errors=True)
+        return
+    # only complete templates are restored
+    os.rename(directory + ".partial", directory)
+
+def removeCachedTemplates(tag):
+    directory = os.path.dirname(templateCacheDirectory(tag, ""))
+    if not os.path.isdir(directory):
+        return
+    for entry in os.listdir(directory):
+        if entry.startswith(tag.split("ctf-")[1] + "-"):
+            debug("removing cached template", entry, level=2)
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+###################
+# PORT ALLOCATION #
+###################
+
+# container ID -> host port reserved for it
+reservedPorts = {}
+portLock = threading.Lock()
+nextPort = None
+
+def reservePort(containerID):
+    global nextPort
+    (first, last) = shared.PORT_RANGE
+    with portLock:
+        if nextPort is None or not first <= nextPort <= last:
+            nextPort = first
+        taken = set(reservedPorts.values())
+        # hand out ports round robin, so a port isn't reused right after its container stopped
+        for _ in range(last - first + 1):
+            port = nextPort
+            nextPort = first if nextPort == last else nextPort + 1
+            if not port in taken and portIsFree(port):
+                reservedPorts[containerID] = port
+                debug("reserved port", port, "for container", containerID, level=3)
+                return port
+    error("no free port left between", first, "and", last, kill=True)
+
+def releasePort(containerID):
+    with portLock:
+        port = reservedPorts.pop(containerID, None)
+    if port is not None:
+        debug("released port", port, "of container", containerID, level=3)
+
+def portIsFree(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("0.0.0.0", port))
+            return True
+        except OSError:
+            return False
+
+##############
+# WARM POOLS #
+##############
+
+# template ID -> {"ready": [prepared duplicate IDs], "wanted": outstanding requests, "filling": duplicates in progress,
+#                  "tasks": the tasks making them, as the event loop only keeps weak references to tasks}
+warmPools = {}
+
+def warmUp(templateID, count):
+    """announces that count duplicates of templateID will be requested and starts preparing them in the background
+    
+    At most shared.WARM_POOL duplicates per template are kept ready. Does nothing if the warm pool is disabled.
+    """
+    if shared.WARM_POOL <= 0 or count <= 0:
+        return
+    if not templateID in warmPools:
+        warmPools[templateID] = {"ready": [], "wanted": 0, "filling": 0, "tasks": set()}
+    warmPools[templateID]["wanted"] += count
+    fillPool(templateID)
+
+def fillPool(templateID):
+    pool = warmPools[templateID]
+    while pool["filling"] + len(pool["ready"]) < min(shared.WARM_POOL, pool["wanted"]):
+        pool["filling"] += 1
+        t = asyncio.create_task(prepareWarmDuplicate(templateID, pool))
+        pool["tasks"].add(t)
+        t.add_done_callback(pool["tasks"].discard)
+
+async def prepareWarmDuplicate(templateID, pool):
+    try:
+        id = await duplicateContainer(templateID)
+    except (Exception, SystemExit) as e:
+        error(type(e), "exception occurred while filling warm pool for", templateID, traceback.format_exc())
+        pool["filling"] -= 1
+        return
+    pool["filling"] -= 1
+    if warmPools.get(templateID) is not pool:
+        # pool was released in the meantime
+        await cleanupEnv(id)
+        return
+    pool["ready"].append(id)
+    debug("warm pool for", templateID, "has", len(pool["ready"]), "ready", level=3)
+
+async def acquireDuplicate(templateID):
+    """returns a prepared duplicate of templateID, taken from its warm pool if one is ready"""
+    if not templateID in warmPools:
+        return await duplicateContainer(templateID)
+    pool = warmPools[templateID]
+    pool["wanted"] = max(pool["wanted"] - 1, 0)
+    if len(pool["ready"]) > 0:
+        id = pool["ready"].pop(0)
+        debug("took", id, "from warm pool for", templateID, level=3)
+        fillPool(templateID)
+        return id
+    debug("warm pool for", templateID, "is empty", level=3)
+    return await duplicateContainer(templateID)
+
+async def releasePool(templateID):
+    """discards the warm pool of templateID, cleaning up all unused duplicates"""
+    if not templateID in warmPools:
+        return
+    pool = warmPools.pop(templateID)
+    # a duplicate still being copied from the template is removed by its task once done, the template has to
+    # outlive that copy. Cancelling the task would leave cp running on a directory nobody knows the ID of.
+    await asyncio.gather(*pool["tasks"])
+    await asyncio.gather(*[cleanupEnv(id) for id in pool["ready"]])
 
 ######################
 # FILE CONTROL UTILS #
@@ -866,6 +1458,16 @@ def readLogs(containerID, name):
     debug("\033[1mdone\033[0m reading logs", level=2)
     return logs
 
+def tailLog(containerID, name, offset):
+    # returns everything appended to the log since offset, along with the new offset
+    try:
+        with open(os.sep.join(["SUT", shared.SUT, "container", "container-" + containerID, name + ".log"]), "rb") as log:
+            log.seek(offset)
+            chunk = log.read()
+    except FileNotFoundError:
+        return ("", offset)
+    return (chunk.decode(errors="replace"), offset + len(chunk))
+
 def dumpIntoFile(path, content, force=False):
     if force:
         with open(path, "w") as f:
@@ -874,15 +1476,44 @@ def dumpIntoFile(path, content, force=False):
         with open(path, "x") as f:
             f.write(content)
 
+##################
+# HOST RESOURCES #
+##################
+
+# seconds the most recent containers took from start until accepting transactions
+startLatencies = collections.deque(maxlen=20)
+
+def hostResources():
+    """samples what the host has left for further containers"""
+    meminfo = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            (key, value) = line.split(":")
+            meminfo[key] = int(value.split()[0]) * 1024
+    fs = os.statvfs(shared.CONTAINER_ROOT)
+    latencies = sorted(startLatencies)
+    return {
+        "memAvailable": meminfo["MemAvailable"],
+        "rootFree": fs.f_bavail * fs.f_frsize,
+        "rootSize": fs.f_blocks * fs.f_frsize,
+        "load": os.getloadavg()[0] / os.cpu_count(),
+        "startLatency": latencies[len(latencies) // 2] if latencies else None,
+    }
+
+def containerFootprint():
+    """host memory one container may take: its memory limit plus its /dev/shm"""
+    return (engine.CONTAINERS.get(shared.SUT, {}).get("memory", 1.5) + 0.5) * 1024 ** 3
+
 ##############
 # MISC UTILS #
 ##############
 
-tls = local()
+# (batch, number) of the current task, set per asyncio task and inherited by asyncio.to_thread
+taskID = ContextVar("taskID", default=None)
 
-def sleep(secs):
+async def sleep(secs):
     debug(f"sleeping for {secs} seconds", level=2)
-    time.sleep(secs)
+    await asyncio.sleep(secs)
 
 def traceHash(log):
     newLog = []
@@ -896,6 +1527,25 @@ def traceHash(log):
             newLog.append(newItem)
     return md5(json.dumps(newLog).encode(encoding="utf-8")).hexdigest()
 
+def fingerprintPersisted(containerID):
+    """hashes names and contents of everything in the persisted directory of a container"""
+    h = md5()
+    directory = os.sep.join(["SUT", shared.SUT, "container", "container-" + containerID, "persisted"])
+    for (root, dirs, files) in os.walk(directory):
+        dirs.sort()
+        h.update(b"d\0" + os.path.relpath(root, directory).encode() + b"\0")
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            h.update(b"f\0" + name.encode() + b"\0" + str(os.lstat(path).st_size).encode() + b"\0")
+            if os.path.islink(path):
+                h.update(os.readlink(path).encode())
+                continue
+            with open(path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    h.update(chunk)
+            h.update(b"\0")
+    return h.hexdigest()
+
 def extractFiles(logs):
     files = {}
     for line in logs: